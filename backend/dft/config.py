@@ -2,10 +2,10 @@
 import logging
 from collections.abc import Mapping, Sequence
 from logging import config as lc
-from typing import Optional, final
+from typing import Literal, Optional, final
 
 import yaml
-from pydantic import field_validator, AnyHttpUrl, EmailStr, HttpUrl
+from pydantic import AliasChoices, Field, field_validator, AnyHttpUrl, EmailStr, HttpUrl
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 HtmlContent = str
@@ -21,6 +21,114 @@ class DftSettings(BaseSettings):
     """
 
     USE_AI: bool
+    # Upper bound on the number of concurrent calls made to the AI when
+    # backtranslating the verses of a terms table.
+    BACKTRANSLATION_MAX_WORKERS: int = 8
+    # Number of verses from the same book to backtranslate per call to
+    # the AI. 1 disables batching.
+    BACKTRANSLATION_BATCH_SIZE: int = 10
+    CHATGPT_MODEL: str = "gpt-3.5-turbo"
+    # The AI provider's requests and tokens per minute limits for
+    # CHATGPT_MODEL which all workers together stay within.
+    AI_REQUESTS_PER_MINUTE: int = 500
+    AI_TOKENS_PER_MINUTE: int = 60_000
+    # Attempts made at a call to the AI that is rate limited or fails
+    # transiently, waiting AI_BACKOFF seconds, doubling each time,
+    # between attempts unless the provider says how long to wait.
+    AI_MAX_ATTEMPTS: int = 6
+    AI_BACKOFF: float = 1.0
+    # Redis instance shared by the API and the workers. Defaults to the
+    # celery broker.
+    REDIS_URL: str = Field(
+        default="redis://",
+        validation_alias=AliasChoices("REDIS_URL", "CELERY_BROKER_URL"),
+    )
+    # Scan USFM sources for just the verses the terms tables need rather
+    # than parsing whole books. Books whose USFM file can't be found fall
+    # back to full parsing.
+    USE_TARGETED_USFM_EXTRACTION: bool = True
+    # Number of threads provisioning (cloning or downloading) USFM
+    # resources concurrently per heart or gateway language.
+    USFM_PROVISIONING_MAX_WORKERS: int = 4
+    # Number of processes parsing USFM books in each worker process.
+    # 0 parses on the provisioning threads which is usually enough when
+    # targeted extraction applies.
+    USFM_PARSING_MAX_WORKERS: int = 0
+    # Bytes of parsed books each worker process keeps for reuse by later
+    # requests, e.g., for other heart languages sharing a gateway
+    # language.
+    BOOK_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    # Progress of a task within a phase, e.g., backtranslating, is
+    # written to the result backend at most once every this many
+    # seconds and only after at least this many more steps.
+    PROGRESS_REPORT_MIN_INTERVAL: float = 1.0
+    PROGRESS_REPORT_MIN_STEPS: int = 1
+    # Seconds an identical document request keeps being coalesced onto
+    # an in flight task without that task renewing its claim, i.e.,
+    # how long a claim outlives a worker that died.
+    DOCUMENT_REQUEST_CLAIM_TTL: int = 10 * 60
+    # Seconds a claim taken when a document request is enqueued lasts
+    # before its task starts and takes over renewing it, i.e., the
+    # longest a task can wait in the queue and still have identical
+    # requests coalesced onto it.
+    DOCUMENT_REQUEST_QUEUED_CLAIM_TTL: int = 6 * 60 * 60
+    # Number of languages of a batch request whose gateway languages are
+    # looked up, and, per gateway language, whose documents are
+    # generated, concurrently.
+    BATCH_MAX_WORKERS: int = 4
+    # Seconds after which a client streaming a task's status that
+    # hasn't received an event is sent the task's status as read from
+    # the result backend, which also keeps the connection alive.
+    TASK_EVENTS_KEEPALIVE: float = 15.0
+    # Port on which each celery worker serves its Prometheus metrics, 0
+    # to not serve them.
+    WORKER_METRICS_PORT: int = 9808
+    # Seconds the intermediate results of generating a terms table,
+    # i.e., its gateway language, verses and backtranslations so far,
+    # are kept for a retried or resubmitted task to resume from. 0
+    # disables checkpointing.
+    CHECKPOINT_TTL: int = 24 * 60 * 60
+    # Languages whose stale terms tables are regenerated by the
+    # scheduled warm up, in addition to the
+    # WARM_UP_POPULAR_LANGUAGES most requested ones.
+    WARM_UP_LANG_CODES: list[str] = []
+    WARM_UP_POPULAR_LANGUAGES: int = 20
+    # Number of languages warmed up concurrently.
+    WARM_UP_MAX_WORKERS: int = 2
+    # Seconds after which the warm up starts no more languages.
+    WARM_UP_TIME_BUDGET: float = 2 * 60 * 60
+    # Hour of the day, UTC, at which the warm up is scheduled, i.e.,
+    # off-peak.
+    WARM_UP_HOUR: int = 3
+    # Seconds after which an object of the output store that no
+    # document points to any longer is pruned, i.e., longer than any
+    # download of it can take.
+    OUTPUT_STORE_PRUNE_GRACE_PERIOD: int = 24 * 60 * 60
+    # Hour of the day, UTC, at which the output store is pruned.
+    OUTPUT_STORE_PRUNE_HOUR: int = 4
+    DATA_API_URL: str = "https://api.bibleineverylanguage.org/v1/graphql"
+    # Seconds to wait on the data API.
+    DATA_API_TIMEOUT: int = 30
+    # Where the data API's introspected schema is cached so that each
+    # process doesn't need to introspect it again and for how many
+    # seconds the cached copy is trusted.
+    DATA_API_SCHEMA_PATH: str = "working/data_api_schema.graphql"
+    DATA_API_SCHEMA_MAX_AGE: int = 60 * 60 * 24
+    # Seconds the cached list of languages is served before it is
+    # refreshed in the background and where the last good list is kept
+    # for when the data API is unavailable.
+    LANGUAGES_CACHE_TTL: int = 60 * 60
+    LANGUAGES_SNAPSHOT_PATH: str = "working/language_codes_and_names.json"
+    # Where backtranslations are persisted: redis, sqlite, or memory (in
+    # process only).
+    BACKTRANSLATION_CACHE_BACKEND: Literal["redis", "sqlite", "memory"] = "redis"
+    BACKTRANSLATION_CACHE_SQLITE_PATH: str = "working/backtranslations.sqlite3"
+    # Seconds after which a cached backtranslation is no longer used.
+    BACKTRANSLATION_CACHE_TTL: int = 60 * 60 * 24 * 90
+    # Size of the per process LRU in front of the persistent store.
+    BACKTRANSLATION_CACHE_MAX_ENTRIES: int = 10_000
+    # Size bound of the SQLite store (Redis relies on its maxmemory-policy).
+    BACKTRANSLATION_CACHE_STORE_MAX_ENTRIES: int = 1_000_000
 
     model_config = SettingsConfigDict(env_file=".env_dft", case_sensitive=True)
 
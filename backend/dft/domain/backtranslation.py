@@ -0,0 +1,325 @@
+"""
+This module provides the backtranslation of heart language verses into
+their associated gateway language via AI.
+"""
+
+import json
+import random
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import cache
+from itertools import groupby
+from typing import Any, Callable, Iterator, Optional, Sequence
+
+import openai
+from dft.config import dft_settings
+from dft.domain import metrics
+from dft.domain.backtranslation_cache import backtranslation_cache, backtranslation_key
+from dft.domain.rate_limiter import rate_limiter
+from dft.domain.verse_text import verse_text, verse_texts
+from document.config import settings
+from toolz import partition_all  # type: ignore
+
+logger = settings.logger(__name__)
+
+# Failures of a single call to the AI that are worth retrying.
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+@cache
+def openai_client() -> openai.OpenAI:
+    """
+    Return this process's OpenAI client. OPENAI_API_KEY gets picked up
+    from env automatically. The client doesn't retry on its own as
+    chat_completion does so within the shared rate limit.
+    """
+    return openai.OpenAI(max_retries=0)
+
+
+def estimated_tokens(prompt: str) -> int:
+    """
+    Return a generous estimate of the tokens a backtranslation of
+    prompt uses, prompt and completion together, to budget for it
+    before the actual usage is known.
+
+    >>> estimated_tokens("Translate Matthew 1:1: 'x' from aaa language to en language")
+    55
+    """
+    # Roughly 3 characters per token for the prompt and about as many
+    # again for the backtranslation.
+    return 2 * len(prompt) // 3 + 16
+
+
+def retry_after(exc: openai.APIError) -> Optional[float]:
+    """Return the seconds the provider asked to wait before retrying, if any."""
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        if "retry-after-ms" in response.headers:
+            return float(response.headers["retry-after-ms"]) / 1000
+        if "retry-after" in response.headers:
+            return float(response.headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+def chat_completion(
+    prompt: str,
+    chatgpt_model: str,
+    max_attempts: int = dft_settings.AI_MAX_ATTEMPTS,
+    backoff: float = dft_settings.AI_BACKOFF,
+    **kwargs: Any,
+) -> Any:
+    """
+    Return the chat completion of prompt, made within the rate limit
+    shared by all workers. A call that is rate limited, times out, or
+    fails on the provider's side is retried on its own, after the
+    provider's Retry-After or else with jittered exponential backoff,
+    rather than failing the task and so every other call of its
+    document. A rate limited call also pauses every other caller.
+    """
+    limiter = rate_limiter(chatgpt_model)
+    estimated_tokens_ = estimated_tokens(prompt)
+    for attempt in range(max_attempts):
+        metrics.STAGE_SECONDS.labels("rate_limit_wait").observe(
+            limiter.acquire(estimated_tokens_)
+        )
+        try:
+            with metrics.stage("backtranslation"):
+                completion = openai_client().chat.completions.create(
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": prompt,
+                        }
+                    ],
+                    model=chatgpt_model,
+                    **kwargs,
+                )
+        except RETRYABLE_ERRORS as exc:
+            # Retrying can't help once the account is out of credit.
+            if attempt + 1 == max_attempts or getattr(exc, "code", None) == (
+                "insufficient_quota"
+            ):
+                raise
+            delay = retry_after(exc) or backoff * 2**attempt * random.uniform(1, 1.5)
+            logger.debug("AI call failed (%s), retrying in %.1fs", exc, delay)
+            metrics.AI_RETRIES.labels(type(exc).__name__).inc()
+            if isinstance(exc, openai.RateLimitError):
+                # The refused call used no tokens.
+                limiter.settle(estimated_tokens_, 0)
+                limiter.pause(delay)
+            else:
+                time.sleep(delay)
+            continue
+        if completion.usage is not None:
+            limiter.settle(estimated_tokens_, completion.usage.total_tokens)
+        return completion
+    raise AssertionError("unreachable")
+
+
+def backtranslate(
+    hl_verse_html: str,
+    verse_reference: str,
+    lang_code: str,
+    gl_lang_code: Optional[str],
+    use_ai: bool = dft_settings.USE_AI,
+    chatgpt_model: str = dft_settings.CHATGPT_MODEL,
+) -> Optional[str]:
+    backtranslation: Optional[str] = ""
+    if hl_verse_html and gl_lang_code and use_ai:
+        hl_verse_text = verse_text(hl_verse_html)
+        cache = backtranslation_cache()
+        key = backtranslation_key(lang_code, gl_lang_code, chatgpt_model, hl_verse_text)
+        backtranslation = cache.get(key)
+        if backtranslation is not None:
+            logger.debug("Backtranslation cache hit for %s", verse_reference)
+            return backtranslation
+        prompt = "Translate {}: '{}' from {} language to {} language".format(
+            verse_reference,
+            hl_verse_text,
+            lang_code,
+            gl_lang_code,
+        )
+        backtranslation = (
+            chat_completion(prompt, chatgpt_model).choices[0].message.content
+        )
+        if backtranslation:
+            cache.set(key, backtranslation)
+    return backtranslation
+
+
+def backtranslate_batch(
+    verses: Sequence[tuple[str, str]],
+    lang_code: str,
+    gl_lang_code: Optional[str],
+    use_ai: bool = dft_settings.USE_AI,
+    chatgpt_model: str = dft_settings.CHATGPT_MODEL,
+) -> list[Optional[str]]:
+    """
+    Backtranslate the (verse_reference, hl_verse) pairs in verses with
+    a single chat completion that is asked to answer with a JSON object
+    keyed by verse reference. Verses already cached are not sent and
+    any verse whose backtranslation is missing or malformed in the
+    response falls back to its own call to backtranslate.
+    """
+    if len(verses) < 2 or not gl_lang_code or not use_ai:
+        return [
+            backtranslate(hl_verse, verse_reference, lang_code, gl_lang_code)
+            for verse_reference, hl_verse in verses
+        ]
+    cache = backtranslation_cache()
+    backtranslations: dict[str, Optional[str]] = {}
+    keys: dict[str, str] = {}
+    hl_verse_texts: dict[str, str] = {}
+    for (verse_reference, hl_verse), hl_verse_text in zip(
+        verses, verse_texts(hl_verse for _, hl_verse in verses)
+    ):
+        if not hl_verse:
+            backtranslations[verse_reference] = ""
+            continue
+        key = backtranslation_key(lang_code, gl_lang_code, chatgpt_model, hl_verse_text)
+        backtranslation = cache.get(key)
+        if backtranslation is None:
+            keys[verse_reference] = key
+            hl_verse_texts[verse_reference] = hl_verse_text
+        else:
+            backtranslations[verse_reference] = backtranslation
+    # A lone uncached verse is sent on its own below.
+    if len(hl_verse_texts) > 1:
+        prompt = (
+            "Translate each of the following verses from {} language to {} language. "
+            "Respond with a JSON object whose keys are exactly the verse references "
+            "below and whose values are the translations.\n\n{}"
+        ).format(
+            lang_code, gl_lang_code, json.dumps(hl_verse_texts, ensure_ascii=False)
+        )
+        completion = chat_completion(
+            prompt, chatgpt_model, response_format={"type": "json_object"}
+        )
+        try:
+            response = json.loads(completion.choices[0].message.content or "")
+        except ValueError:
+            logger.debug("Batched backtranslation response was not valid JSON")
+            response = {}
+        if not isinstance(response, dict):
+            response = {}
+        for verse_reference, key in keys.items():
+            backtranslation = response.get(verse_reference)
+            if isinstance(backtranslation, str) and backtranslation.strip():
+                cache.set(key, backtranslation)
+                backtranslations[verse_reference] = backtranslation
+            else:
+                logger.debug(
+                    "Batched backtranslation missing %s, falling back to single verse",
+                    verse_reference,
+                )
+    return [
+        (
+            backtranslations[verse_reference]
+            if verse_reference in backtranslations
+            else backtranslate(hl_verse, verse_reference, lang_code, gl_lang_code)
+        )
+        for verse_reference, hl_verse in verses
+    ]
+
+
+def verse_batches(
+    verses: Sequence[tuple[str, str]],
+    batch_size: int,
+) -> list[list[int]]:
+    """
+    Partition the indices of verses into batches of at most batch_size
+    consecutive verses that all come from the same book.
+
+    >>> verse_batches([("Matthew 1:1", ""), ("Matthew 1:2", ""), ("Matthew 2:3", ""), ("Mark 1:1", "")], 2)
+    [[0, 1], [2], [3]]
+    """
+    batches = []
+    for _, book_indices in groupby(
+        range(len(verses)), key=lambda index: verses[index][0].rsplit(" ", 1)[0]
+    ):
+        batches.extend(
+            [list(batch) for batch in partition_all(max(1, batch_size), book_indices)]
+        )
+    return batches
+
+
+def backtranslations_as_completed(
+    verses: Sequence[tuple[str, str]],
+    lang_code: str,
+    gl_lang_code: Optional[str],
+    max_workers: int = dft_settings.BACKTRANSLATION_MAX_WORKERS,
+    batch_size: int = dft_settings.BACKTRANSLATION_BATCH_SIZE,
+) -> Iterator[tuple[int, Optional[str]]]:
+    """
+    Backtranslate every (verse_reference, hl_verse) pair in verses
+    using at most max_workers concurrent calls to the AI and yield the
+    index in verses and backtranslation of each verse as soon as it is
+    available. When batch_size is greater than one, verses from the
+    same book are sent batch_size at a time per call.
+    """
+    if not verses:
+        return
+    batches = verse_batches(verses, batch_size)
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(batches))),
+        thread_name_prefix="backtranslate",
+    ) as executor:
+        futures: dict[Future[list[Optional[str]]], list[int]] = {
+            executor.submit(
+                backtranslate_batch,
+                [verses[index] for index in batch],
+                lang_code,
+                gl_lang_code,
+            ): batch
+            for batch in batches
+        }
+        try:
+            for future in as_completed(futures):
+                yield from zip(futures[future], future.result())
+        except:
+            # Don't keep paying for backtranslations whose results
+            # will be thrown away when the task is retried.
+            for future in futures:
+                future.cancel()
+            raise
+    logger.debug("Backtranslation cache stats: %s", backtranslation_cache().stats())
+
+
+def backtranslate_verses(
+    verses: Sequence[tuple[str, str]],
+    lang_code: str,
+    gl_lang_code: Optional[str],
+    max_workers: int = dft_settings.BACKTRANSLATION_MAX_WORKERS,
+    batch_size: int = dft_settings.BACKTRANSLATION_BATCH_SIZE,
+    on_backtranslated: Optional[Callable[[int, int, str], None]] = None,
+) -> list[Optional[str]]:
+    """
+    Backtranslate every (verse_reference, hl_verse) pair in verses as
+    backtranslations_as_completed does and return the backtranslations
+    in the same order as verses.
+
+    on_backtranslated, if provided, is called on the calling thread
+    (so it is safe to use celery's current_task in it) with the number
+    of verses completed so far, the total number of verses, and the
+    verse reference just completed.
+    """
+    backtranslations: list[Optional[str]] = [""] * len(verses)
+    for completed, (index, backtranslation) in enumerate(
+        backtranslations_as_completed(
+            verses, lang_code, gl_lang_code, max_workers, batch_size
+        ),
+        start=1,
+    ):
+        backtranslations[index] = backtranslation
+        if on_backtranslated:
+            on_backtranslated(completed, len(verses), verses[index][0])
+    return backtranslations
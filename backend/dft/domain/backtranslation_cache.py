@@ -0,0 +1,231 @@
+"""
+This module provides a tiered, content addressed cache of AI
+backtranslations: an in-process LRU in front of a persistent store
+(SQLite or Redis) that is shared by every worker on a host (SQLite) or
+across hosts (Redis).
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from functools import cache
+from pathlib import Path
+from typing import Optional, Protocol
+
+from dft.config import dft_settings
+from dft.domain import metrics
+from dft.domain.redis_client import redis_client
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+
+def backtranslation_key(
+    lang_code: str,
+    gl_lang_code: str,
+    chatgpt_model: str,
+    hl_verse_text: str,
+) -> str:
+    """
+    Return the cache key for the backtranslation of hl_verse_text.
+    The verse text is hashed after stripping surrounding whitespace so
+    that the same verse appearing in different tables or runs shares
+    one entry.
+
+    >>> backtranslation_key("aob", "tpi", "gpt-3.5-turbo", " foo ")[:17]
+    'aob:tpi:gpt-3.5-t'
+    """
+    verse_digest = hashlib.sha256(hl_verse_text.strip().encode("utf-8")).hexdigest()
+    return f"{lang_code}:{gl_lang_code}:{chatgpt_model}:{verse_digest}"
+
+
+class BacktranslationStore(Protocol):
+    """A persistent store of backtranslations keyed by backtranslation_key."""
+
+    def get(self, key: str) -> Optional[str]: ...
+
+    def set(self, key: str, backtranslation: str) -> None: ...
+
+
+class SqliteBacktranslationStore:
+    """
+    Store backtranslations in a SQLite database on local disk. Entries
+    older than ttl seconds are treated as missing and, once the store
+    holds more than max_entries, the least recently written entries are
+    evicted.
+    """
+
+    def __init__(
+        self, db_path: str, ttl: int, max_entries: int, prune_every: int = 256
+    ) -> None:
+        self._db_path = db_path
+        self._ttl = ttl
+        self._max_entries = max_entries
+        self._prune_every = prune_every
+        self._writes = 0
+        self._local = threading.local()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS backtranslations "
+                "(key TEXT PRIMARY KEY, backtranslation TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS backtranslations_created_at "
+                "ON backtranslations (created_at)"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        # SQLite connections may not be shared across threads.
+        connection: Optional[sqlite3.Connection] = getattr(
+            self._local, "connection", None
+        )
+        if connection is None:
+            connection = sqlite3.connect(self._db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[str]:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT backtranslation FROM backtranslations WHERE key = ? AND created_at > ?",
+                (key, time.time() - self._ttl),
+            )
+            .fetchone()
+        )
+        return str(row[0]) if row else None
+
+    def set(self, key: str, backtranslation: str) -> None:
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO backtranslations VALUES (?, ?, ?)",
+                (key, backtranslation, time.time()),
+            )
+            # Pruning scans the table so only do it every so often.
+            self._writes += 1
+            if self._writes % self._prune_every:
+                return
+            connection.execute(
+                "DELETE FROM backtranslations WHERE created_at <= ?",
+                (time.time() - self._ttl,),
+            )
+            connection.execute(
+                "DELETE FROM backtranslations WHERE key IN "
+                "(SELECT key FROM backtranslations ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,),
+            )
+
+
+class RedisBacktranslationStore:
+    """
+    Store backtranslations in Redis so that they are shared by workers
+    on every host. Entries expire after ttl seconds; size based eviction
+    is left to the Redis server's maxmemory-policy.
+    """
+
+    def __init__(self, ttl: int, key_prefix: str = "dft:backtranslation:") -> None:
+        self._ttl = ttl
+        self._key_prefix = key_prefix
+
+    def get(self, key: str) -> Optional[str]:
+        value = redis_client().get(f"{self._key_prefix}{key}")
+        return value.decode("utf-8") if isinstance(value, bytes) else None
+
+    def set(self, key: str, backtranslation: str) -> None:
+        redis_client().set(f"{self._key_prefix}{key}", backtranslation, ex=self._ttl)
+
+
+class BacktranslationCache:
+    """
+    An in-process LRU of at most max_entries backtranslations in front
+    of an optional persistent store. Entries remembered more than ttl
+    seconds ago are treated as missing, as the store treats its own, so
+    that a long lived worker doesn't keep serving backtranslations the
+    store has expired. Store failures are logged and treated as misses
+    so that an unavailable store never fails a document request.
+    """
+
+    def __init__(
+        self, store: Optional[BacktranslationStore], max_entries: int, ttl: int
+    ) -> None:
+        self._store = store
+        self._max_entries = max_entries
+        self._ttl = ttl
+        # key -> (time remembered, backtranslation)
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.store_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._entries:
+                remembered_at, backtranslation_ = self._entries[key]
+                if time.monotonic() - remembered_at < self._ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    metrics.cache_lookup("backtranslation", True)
+                    return backtranslation_
+                del self._entries[key]
+        backtranslation = None
+        if self._store:
+            try:
+                backtranslation = self._store.get(key)
+            except Exception:
+                logger.exception("Backtranslation store lookup failed for %s", key)
+        with self._lock:
+            if backtranslation is None:
+                self.misses += 1
+                metrics.cache_lookup("backtranslation", False)
+            else:
+                metrics.cache_lookup("backtranslation", True)
+                self.store_hits += 1
+                self._remember(key, backtranslation)
+        return backtranslation
+
+    def set(self, key: str, backtranslation: str) -> None:
+        with self._lock:
+            self._remember(key, backtranslation)
+        if self._store:
+            try:
+                self._store.set(key, backtranslation)
+            except Exception:
+                logger.exception("Backtranslation store write failed for %s", key)
+
+    def _remember(self, key: str, backtranslation: str) -> None:
+        self._entries[key] = (time.monotonic(), backtranslation)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self._max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "store_hits": self.store_hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+            }
+
+
+@cache
+def backtranslation_cache(
+    backend: str = dft_settings.BACKTRANSLATION_CACHE_BACKEND,
+    sqlite_path: str = dft_settings.BACKTRANSLATION_CACHE_SQLITE_PATH,
+    ttl: int = dft_settings.BACKTRANSLATION_CACHE_TTL,
+    max_entries: int = dft_settings.BACKTRANSLATION_CACHE_MAX_ENTRIES,
+    store_max_entries: int = dft_settings.BACKTRANSLATION_CACHE_STORE_MAX_ENTRIES,
+) -> BacktranslationCache:
+    """Return the process wide backtranslation cache."""
+    store: Optional[BacktranslationStore] = None
+    if backend == "sqlite":
+        store = SqliteBacktranslationStore(sqlite_path, ttl, store_max_entries)
+    elif backend == "redis":
+        store = RedisBacktranslationStore(ttl)
+    logger.debug("Using backtranslation cache backend: %s", backend)
+    return BacktranslationCache(store, max_entries, ttl)
@@ -0,0 +1,126 @@
+"""
+This module provides a process wide, memory bounded LRU cache of
+TermsBook instances so that a worker that has already loaded, e.g.,
+the Tok Pisin books for one heart language doesn't parse them again
+for the next heart language sharing that gateway language.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from functools import cache
+from typing import Mapping, Optional
+
+from dft.config import dft_settings
+from dft.domain import usfm_extraction
+from dft.domain.model import TermsBook
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+# (lang_code, resource_type, book_code, source revision, chapters and verses)
+BookKey = tuple[str, str, str, str, tuple[tuple[int, tuple[int, ...]], ...]]
+
+
+def source_revision(resource_dir: str, book_code: str) -> str:
+    """
+    Return a token that changes whenever the provisioned source of
+    book_code in resource_dir changes, i.e., the modification time and
+    size of its USFM file or, when there isn't one, of resource_dir.
+    """
+    path = usfm_extraction.usfm_file(resource_dir, book_code) or resource_dir
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return ""
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def book_key(
+    lang_code: str,
+    resource_type: str,
+    book_code: str,
+    revision: str,
+    chapters: Mapping[int, set[int]],
+) -> BookKey:
+    """
+    >>> book_key("tpi", "reg", "mat", "1:2", {11: {28, 27}})
+    ('tpi', 'reg', 'mat', '1:2', ((11, (27, 28)),))
+    """
+    return (
+        lang_code,
+        resource_type,
+        book_code,
+        revision,
+        tuple(
+            sorted(
+                (chapter_num, tuple(sorted(verse_nums)))
+                for chapter_num, verse_nums in chapters.items()
+            )
+        ),
+    )
+
+
+def book_size(usfm_book: TermsBook) -> int:
+    """Return an estimate of the bytes usfm_book occupies."""
+    return sys.getsizeof(usfm_book) + sum(
+        sys.getsizeof(verse_num) + sys.getsizeof(verse)
+        for chapter in usfm_book.chapters.values()
+        for verse_num, verse in chapter.verses.items()
+    )
+
+
+class BookCache:
+    """
+    An LRU of TermsBook instances that holds at most max_bytes worth
+    of books, as estimated by book_size.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max_bytes = max_bytes
+        self._books: OrderedDict[BookKey, tuple[TermsBook, int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: BookKey) -> Optional[TermsBook]:
+        with self._lock:
+            if key not in self._books:
+                self.misses += 1
+                return None
+            self._books.move_to_end(key)
+            self.hits += 1
+            return self._books[key][0]
+
+    def put(self, key: BookKey, usfm_book: TermsBook) -> None:
+        size = book_size(usfm_book)
+        if size > self._max_bytes:
+            return
+        with self._lock:
+            if key in self._books:
+                self._bytes -= self._books.pop(key)[1]
+            self._books[key] = (usfm_book, size)
+            self._bytes += size
+            while self._bytes > self._max_bytes:
+                _, (_, evicted_size) = self._books.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._books),
+                "bytes": self._bytes,
+            }
+
+
+@cache
+def book_cache(max_bytes: int = dft_settings.BOOK_CACHE_MAX_BYTES) -> BookCache:
+    """Return this process's book cache."""
+    return BookCache(max_bytes)
@@ -1,5 +1,8 @@
 import os
 
+from celery.schedules import crontab
+from dft.config import dft_settings
+
 ## Broker settings.
 broker_url = os.environ.get("CELERY_BROKER_URL", "redis://")
 
@@ -7,4 +10,18 @@ broker_url = os.environ.get("CELERY_BROKER_URL", "redis://")
 result_backend = os.environ.get("CELERY_RESULT_BACKEND", "redis://")
 
 # List of modules to import when the Celery worker starts.
-imports = ("dft.domain.dft_checker",)
+imports = ("dft.domain.dft_checker", "dft.domain.warm_up")
+
+# Off-peak regeneration of stale terms tables, and pruning of the
+# documents that regeneration superseded, run by celery beat.
+beat_schedule = {
+    "warm-up": {
+        "task": "dft.domain.warm_up.warm_up",
+        "schedule": crontab(hour=dft_settings.WARM_UP_HOUR, minute=0),
+    },
+    "prune-output-store": {
+        "task": "dft.domain.dft_checker.prune_output_store",
+        "schedule": crontab(hour=dft_settings.OUTPUT_STORE_PRUNE_HOUR, minute=0),
+    },
+}
+timezone = "UTC"
@@ -0,0 +1,146 @@
+"""
+This module provides checkpoints, in Redis, of the intermediate results
+of generating terms tables: the heart language's associated gateway
+language, the rows of verses loaded for each table and each verse
+backtranslated so far. A task that is retried, or a request that is
+resubmitted, after failing part way, e.g., on verse 90 of 100, resumes
+from its checkpoint rather than looking up the gateway language and
+backtranslating every verse again. The rows and backtranslations are
+checkpointed under a key that includes the revision of the books they
+were loaded from, as recorded when the books were loaded, so that they
+aren't resumed from once the books have changed.
+
+A checkpoint is cleared once its tables' HTML is complete and expires
+after ttl seconds if it never is. A ttl of 0 disables checkpointing,
+e.g., where there is no Redis. Redis being unavailable doesn't fail
+generation, it only disables resuming.
+"""
+
+import json
+from typing import Any, Optional, Sequence
+
+import redis
+from dft.config import dft_settings
+from dft.domain.redis_client import redis_client
+from dft.domain.row_manifest import Row
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+
+class Checkpoint:
+    """The intermediate results, in Redis, of generating the tables keyed key."""
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        key: str,
+        ttl: int,
+        key_prefix: str = "dft:checkpoint:",
+    ) -> None:
+        self._client = client
+        self._ttl = ttl
+        self._key = f"{key_prefix}{key}"
+        self._backtranslations_key = f"{key_prefix}{key}:backtranslations"
+
+    @property
+    def enabled(self) -> bool:
+        return self._ttl > 0
+
+    def _load(self, field: Optional[str] = None) -> Any:
+        """
+        Return the value of field of the checkpoint, or, if field is
+        None, the backtranslations, or None if there's nothing to load.
+        """
+        if not self.enabled:
+            return None
+        try:
+            if field is None:
+                return self._client.hgetall(self._backtranslations_key)
+            return self._client.hget(self._key, field)
+        except redis.RedisError:
+            logger.exception("Could not read checkpoint %s", self._key)
+            return None
+
+    def _save(self, key: str, mapping: dict[str, str]) -> None:
+        if not self.enabled:
+            return
+        try:
+            with self._client.pipeline() as pipeline:
+                pipeline.hset(key, mapping=mapping)  # type: ignore[arg-type]
+                pipeline.expire(key, self._ttl)
+                pipeline.execute()  # type: ignore[no-untyped-call]
+        except redis.RedisError:
+            logger.exception("Could not save checkpoint %s", key)
+
+    def gl_lang_code(self) -> tuple[bool, Optional[str]]:
+        """
+        Return whether the associated gateway language was checkpointed
+        and, if so, its code, which is None if there isn't one.
+        """
+        value = self._load("gl_lang_code")
+        if value is None:
+            return False, None
+        return True, json.loads(value)
+
+    def save_gl_lang_code(self, gl_lang_code: Optional[str]) -> None:
+        self._save(self._key, {"gl_lang_code": json.dumps(gl_lang_code)})
+
+    def table_rows(self) -> Optional[list[list[Row]]]:
+        """Return the checkpointed rows of each table, if any."""
+        value = self._load("table_rows")
+        if value is None:
+            return None
+        return [
+            [
+                (verse_reference, gl_verse, hl_verse)
+                for verse_reference, gl_verse, hl_verse in rows
+            ]
+            for rows in json.loads(value)
+        ]
+
+    def save_table_rows(
+        self, gl_lang_code: Optional[str], table_rows: Sequence[Sequence[Row]]
+    ) -> None:
+        """Checkpoint the rows of each table and the gateway language of their GL verses."""
+        self._save(
+            self._key,
+            {
+                "gl_lang_code": json.dumps(gl_lang_code),
+                "table_rows": json.dumps(table_rows),
+            },
+        )
+
+    def backtranslations(self) -> dict[tuple[str, str], str]:
+        """
+        Return the checkpointed backtranslations keyed by (verse
+        reference, HL verse).
+        """
+        backtranslations = {}
+        for verse, backtranslation in (self._load() or {}).items():
+            verse_reference, hl_verse = json.loads(verse)
+            backtranslations[(verse_reference, hl_verse)] = backtranslation.decode(
+                "utf-8"
+            )
+        return backtranslations
+
+    def save_backtranslation(
+        self, verse: tuple[str, str], backtranslation: str
+    ) -> None:
+        self._save(
+            self._backtranslations_key,
+            {json.dumps(verse, ensure_ascii=False): backtranslation},
+        )
+
+    def clear(self) -> None:
+        if not self.enabled:
+            return
+        try:
+            self._client.delete(self._key, self._backtranslations_key)
+        except redis.RedisError:
+            logger.exception("Could not clear checkpoint %s", self._key)
+
+
+def checkpoint(key: str, ttl: int = dft_settings.CHECKPOINT_TTL) -> Checkpoint:
+    """Return the checkpoint of generating the tables keyed key."""
+    return Checkpoint(redis_client(), key, ttl)
@@ -0,0 +1,193 @@
+"""
+This module provides the process wide client of the data API's GraphQL
+endpoint used by both the API and the workers. Connections are pooled
+for the life of the process and the schema is introspected at most
+once per process (and is reused across processes via a cached schema
+file).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from dft.config import dft_settings
+from document.config import settings
+from gql import Client, gql
+from gql.client import AsyncClientSession, SyncClientSession
+from gql.transport.aiohttp import AIOHTTPTransport
+from gql.transport.requests import RequestsHTTPTransport
+from graphql import DocumentNode, build_schema, print_schema
+
+logger = settings.logger(__name__)
+
+
+# WAITING WA is going to add an is_gateway attribute eventually so that we
+# don't have to figure out if gateway ourselves
+LANGUAGES_QUERY: DocumentNode = gql(
+    """query Languages {
+  content(
+    where: {wa_content_meta: {status: {_eq: "Primary"}, show_on_biel: {_eq: true}}}
+  ) {
+    language {
+      ietf_code
+      english_name
+      national_name
+    }
+  }
+}
+"""
+)
+
+GATEWAY_LANGUAGE_QUERY: DocumentNode = gql(
+    """query GetGatewayLanguage($ietfCode: String!) {
+  language(where: {ietf_code: {_eq: $ietfCode}}) {
+    ietf_code
+    english_name
+    languagesToLanguagesByGatewayLanguageToIetf {
+      gateway_language_ietf
+      language {
+        english_name
+      }
+    }
+  }
+}
+"""
+)
+
+
+_lock = threading.Lock()
+_sync_session: Optional[SyncClientSession] = None
+_async_session: Optional[AsyncClientSession] = None
+_async_lock: Optional[asyncio.Lock] = None
+# The pid the sessions above were created in so that a forked worker
+# doesn't inherit its parent's connections.
+_pid: Optional[int] = None
+
+
+def cached_schema(
+    schema_path: str = dft_settings.DATA_API_SCHEMA_PATH,
+    max_age: int = dft_settings.DATA_API_SCHEMA_MAX_AGE,
+) -> Optional[str]:
+    """
+    Return the data API schema cached at schema_path if it exists and
+    is younger than max_age seconds.
+    """
+    path = Path(schema_path)
+    if path.exists() and time.time() - path.stat().st_mtime < max_age:
+        return path.read_text()
+    return None
+
+
+def cache_schema(
+    client: Client,
+    schema_path: str = dft_settings.DATA_API_SCHEMA_PATH,
+) -> None:
+    """Write the schema client introspected to schema_path for reuse."""
+    if client.schema is None:
+        return
+    path = Path(schema_path)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(print_schema(client.schema))
+        tmp_path.replace(path)
+    except OSError:
+        logger.exception("Could not cache data API schema to %s", schema_path)
+
+
+def _client(
+    transport: Any,
+    schema: Optional[str],
+    execute_timeout: int = dft_settings.DATA_API_TIMEOUT,
+) -> Client:
+    return Client(
+        transport=transport,
+        schema=build_schema(schema) if schema else None,
+        fetch_schema_from_transport=schema is None,
+        execute_timeout=execute_timeout,
+    )
+
+
+def _sync_client_session(
+    data_api_url: str = dft_settings.DATA_API_URL,
+    timeout: int = dft_settings.DATA_API_TIMEOUT,
+) -> SyncClientSession:
+    global _sync_session, _pid
+    with _lock:
+        if _pid != os.getpid():
+            _reset()
+        if _sync_session is None:
+            schema = cached_schema()
+            client = _client(
+                RequestsHTTPTransport(url=data_api_url, timeout=timeout, retries=3),
+                schema,
+            )
+            _sync_session = client.connect_sync()  # type: ignore[no-untyped-call]
+            if schema is None:
+                cache_schema(client)
+        return _sync_session
+
+
+async def _async_client_session(
+    data_api_url: str = dft_settings.DATA_API_URL,
+    timeout: int = dft_settings.DATA_API_TIMEOUT,
+) -> AsyncClientSession:
+    global _async_session, _async_lock, _pid
+    with _lock:
+        if _pid != os.getpid():
+            _reset()
+        if _async_lock is None:
+            _async_lock = asyncio.Lock()
+    async with _async_lock:
+        if _async_session is None:
+            schema = cached_schema()
+            client = _client(
+                AIOHTTPTransport(url=data_api_url, timeout=timeout), schema
+            )
+            _async_session = await client.connect_async()  # type: ignore[no-untyped-call]
+            if schema is None:
+                cache_schema(client)
+        return _async_session
+
+
+def _reset() -> None:
+    global _sync_session, _async_session, _async_lock, _pid
+    _sync_session = None
+    _async_session = None
+    _async_lock = None
+    _pid = os.getpid()
+
+
+def execute(
+    query: DocumentNode, variable_values: Optional[dict[str, Any]] = None
+) -> dict[str, Any]:
+    """
+    Execute query against the data API over the process's pooled
+    connection, e.g., from a celery worker.
+
+    >>> execute(GATEWAY_LANGUAGE_QUERY, {"ietfCode": "aob"})["language"][0]["languagesToLanguagesByGatewayLanguageToIetf"][0]["gateway_language_ietf"]
+    'tpi'
+    """
+    return _sync_client_session().execute(query, variable_values=variable_values)
+
+
+async def execute_async(
+    query: DocumentNode, variable_values: Optional[dict[str, Any]] = None
+) -> dict[str, Any]:
+    """
+    Execute query against the data API over the process's pooled
+    connection from within an event loop, e.g., from the API.
+    """
+    session = await _async_client_session()
+    return await session.execute(query, variable_values=variable_values)
+
+
+async def close_async() -> None:
+    """Close the pooled async connection, e.g., on API shutdown."""
+    global _async_session
+    if _async_session is not None:
+        await _async_session.client.close_async()  # type: ignore[no-untyped-call]
+        _async_session = None
@@ -1,27 +1,68 @@
-import re
-from typing import Any, Mapping, Optional, Sequence, TypeVar
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import (
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+    as_completed,
+)
+from contextlib import ExitStack, nullcontext
+from functools import cache
+from typing import Any, Callable, Iterable, Mapping, Optional, Sequence, TypeVar
 
-from celery import current_task
+from celery import chord, current_task
 from docx import Document  # type: ignore
 from docxcompose.composer import Composer  # type: ignore
-import openai
-from bs4 import BeautifulSoup
 from dft.config import dft_settings
 
 # from dft.domain import model
 from document.config import settings
-from document.domain import document_generator, parsing, resource_lookup, worker
+from document.domain import document_generator, resource_lookup, worker
 from document.domain.bible_books import BOOK_NAMES
-from document.domain.model import USFMBook
 from document.utils.file_utils import asset_file_needs_update
 from document.domain.assembly_strategies_docx import assembly_strategy_utils
+from dft.domain import (
+    book_cache,
+    checkpoint,
+    data_api,
+    metrics,
+    output_store,
+    row_manifest,
+    usfm_extraction,
+)
+from dft.domain.backtranslation import backtranslations_as_completed
+from dft.domain.documents import (
+    ALL_TERMS_TABLES,
+    TERMS_TABLES,
+    document_needs_update,
+    document_request_key,
+    fresh_terms_documents,
+    single_flight_key,
+    table_lock_keys,
+    terms_document,
+)
 from dft.domain.god_the_father_terms import gtf_terms_table
-from gql import Client, gql
-from gql.transport.aiohttp import AIOHTTPTransport
+from dft.domain.row_manifest import Row, RowManifest
+from dft.domain.single_flight import non_coalescable_id, single_flight
+from dft.domain.table_writer import TableWriter
+from graphql import DocumentNode
 from pydantic import HttpUrl, Json
 from dft.domain.son_of_god_terms import sog_terms_table
-from dft.domain.model import DocumentRequest
-from toolz import unique  # type: ignore
+from dft.domain.model import (
+    BatchDocumentRequest,
+    BatchMemberResult,
+    DocumentRequest,
+    DocumentRequestTermsEnum,
+    TermsBook,
+    TaskProgressPhaseEnum,
+    TermsDocument,
+    TermsTable,
+)
+from dft.domain.progress import ProgressReporter
+from toolz import concat, groupby, unique  # type: ignore
 
 logger = settings.logger(__name__)
 
@@ -31,86 +72,6 @@ COLUMN_LABELS: str = "<tr><td>Verse Reference</td><td>GL (from DOC)</td><td>HL (
 T = TypeVar("T")
 
 
-async def lang_codes_and_names(
-    # WAITING Needed to download translations.json for other functions where data API is not mature enough yet:
-    working_dir: str = settings.RESOURCE_ASSETS_DIR,
-    # WAITING Needed to download translations.json for other functions where data API is not mature enough yet:
-    translations_json_location: HttpUrl = settings.TRANSLATIONS_JSON_LOCATION,
-    lang_code_filter_list: Sequence[str] = settings.LANG_CODE_FILTER_LIST,
-    gateway_languages: Sequence[str] = settings.GATEWAY_LANGUAGES,
-    data_api_url: str = "https://api.bibleineverylanguage.org/v1/graphql",
-    # WAITING WA is going to add an is_gateway attribute eventually so that we
-    # don't have to figure out if gateway ourselves
-    graphql_query: str = """query MyQuery {
-  content(
-    where: {wa_content_meta: {status: {_eq: "Primary"}, show_on_biel: {_eq: true}}}
-  ) {
-    language {
-      ietf_code
-      english_name
-      national_name
-    }
-  }
-}
-        """,
-) -> Sequence[tuple[str, str, bool]]:
-    """
-    >>> from document.domain import resource_lookup
-    >>> # data = await resource_lookup.lang_codes_and_names2()
-    >>> # data[0]
-    ('abz', 'Abui', False)
-    """
-
-    # WAITING Needed to download translations.json for other functions
-    # where data API is not mature enough yet. Remove when data API can
-    # fully replace translations.json. For now this will make the app
-    # slower.
-    # data = fetch_source_data(working_dir, str(translations_json_location))
-
-    # Select your transport with a defined url endpoint
-    transport = AIOHTTPTransport(url=data_api_url)
-
-    # Create a GraphQL client using the defined transport
-    client = Client(transport=transport, fetch_schema_from_transport=True)
-
-    query = gql(graphql_query)
-    data = await client.execute_async(query)
-    languages_info = None
-    values = []
-    try:
-        languages_info = data["content"]
-        # logger.debug("data['content'][0]: %s", languages_info)
-        for language_info in languages_info:
-            language = language_info["language"]
-            ietf_code = language["ietf_code"]
-            english_name = language["english_name"]
-            national_name = language["national_name"]
-            is_gateway = ietf_code in gateway_languages
-            if ietf_code not in lang_code_filter_list:
-                if english_name in national_name:
-                    logger.debug(
-                        "About to add: %s", (ietf_code, national_name, is_gateway)
-                    )
-                    values.append((ietf_code, national_name, is_gateway))
-                else:
-                    logger.debug(
-                        "About to add: %s",
-                        (ietf_code, f"{national_name} ({english_name})", is_gateway),
-                    )
-                    values.append(
-                        (ietf_code, f"{national_name} ({english_name})", is_gateway)
-                    )
-
-    except:
-        logger.exception("Failed due to the following exception")
-    unique_values = unique(values, key=lambda value: value[0])
-    # heart_langs = [
-    #     unique_value for unique_value in unique_values if not unique_value[2]
-    # ]
-    # logger.debug("heart_langs: %s", heart_langs)
-    return sorted(unique_values, key=lambda value: value[1])
-
-
 def resource_types_and_names_for_lang(
     lang_code: str,
     working_dir: str = settings.RESOURCE_ASSETS_DIR,
@@ -166,37 +127,14 @@ def log_event(context: dict[str, T]) -> None:
 
 def associated_gateway_language_for_heart_language(
     lang_code: str,
-    data_api_url: str = "https://api.bibleineverylanguage.org/v1/graphql",
-    graphql_query: str = """query GetGatewayLanguage {
-          language(where: {ietf_code: {_eq: "foo"}}) {
-            ietf_code
-            english_name
-            languagesToLanguagesByGatewayLanguageToIetf {
-              gateway_language_ietf
-              language {
-                english_name
-              }
-            }
-          }
-        }
-        """,
+    graphql_query: DocumentNode = data_api.GATEWAY_LANGUAGE_QUERY,
 ) -> Optional[str]:
     """
     >>> associated_gateway_language_for_heart_language("aob")
     'tpi'
     """
-    # Select your transport with a defined url endpoint
-    transport = AIOHTTPTransport(url=data_api_url)
-
-    # Create a GraphQL client using the defined transport
-    client = Client(transport=transport, fetch_schema_from_transport=True)
-
-    # Provide a GraphQL query
-    # params = {"heartLangCode": lang_code}
-    # Formatting graphql strings is a bit of pain, using re.sub works.
-    query = gql(re.sub("foo", lang_code, graphql_query))
-    # result = client.execute(query, variable_values=params)
-    result = client.execute(query)
+    with metrics.stage("gateway_language"):
+        result = data_api.execute(graphql_query, {"ietfCode": lang_code})
     gl_lang_code = None
     try:
         gl_lang_code = result["language"][0][
@@ -214,83 +152,710 @@ def usfm_books(
     book_codes: list[str],
     usfm_resource_types_and_names: list[tuple[str, str]],
     lang_code: str,
-) -> list[USFMBook]:
-    usfm_books = []
-    for book_code in book_codes:
-        for usfm_resource_type_and_name in usfm_resource_types_and_names:
-            resource_lookup_dto = resource_lookup.usfm_resource_lookup(
-                lang_code,
-                usfm_resource_type_and_name[0],
-                book_code,
-            )
-            resource_dir = resource_lookup.provision_asset_files(resource_lookup_dto)
-            try:
-                # Reify the content
-                usfm_book = parsing.usfm_book_content(
-                    resource_lookup_dto, resource_dir, [], False
+    terms_tables: Sequence[dict[str, dict[int, list[int]]]],
+    use_targeted_usfm_extraction: bool = dft_settings.USE_TARGETED_USFM_EXTRACTION,
+    provisioning_max_workers: int = dft_settings.USFM_PROVISIONING_MAX_WORKERS,
+) -> list[TermsBook]:
+    """
+    Provision and then parse each book for each USFM resource type.
+    Provisioning, which is network and disk bound, runs on up to
+    provisioning_max_workers threads; parsing runs on the process wide
+    parsing pool if one is configured. Books are returned in the order
+    of book_codes and then usfm_resource_types_and_names regardless of
+    the order in which they finish.
+    """
+
+    def provision_and_parse(book_code: str, resource_type: str) -> Optional[TermsBook]:
+        resource_lookup_dto, resource_dir = provision_usfm_book(
+            lang_code, resource_type, book_code
+        )
+        chapters = usfm_extraction.needed_chapters(terms_tables, book_code)
+        source_revision = book_cache.source_revision(resource_dir, book_code)
+        key = book_cache.book_key(
+            lang_code, resource_type, book_code, source_revision, chapters
+        )
+        usfm_book = book_cache.book_cache().get(key)
+        metrics.cache_lookup("book", usfm_book is not None)
+        if usfm_book:
+            logger.debug("Book cache hit for %s", key[:4])
+            return usfm_book
+        try:
+            with metrics.stage("usfm_parsing"):
+                usfm_book = parse_usfm_book(
+                    resource_lookup_dto,
+                    resource_dir,
+                    lang_code,
+                    resource_type,
+                    book_code,
+                    chapters,
+                    use_targeted_usfm_extraction,
                 )
-            except:
-                logger.exception("Failed due to the following exception")
-            else:
-                usfm_books.append(usfm_book)
+        except:
+            logger.exception("Failed due to the following exception")
+            return None
+        if usfm_book:
+            usfm_book.source_revision = source_revision
+        book_cache.book_cache().put(key, usfm_book)
+        return usfm_book
+
+    jobs = [
+        (book_code, usfm_resource_type_and_name[0])
+        for book_code in book_codes
+        for usfm_resource_type_and_name in usfm_resource_types_and_names
+    ]
+    if not jobs:
+        return []
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(provisioning_max_workers, len(jobs))),
+        thread_name_prefix="provision",
+    ) as executor:
+        # map yields results in the order of jobs
+        usfm_books = [
+            usfm_book
+            for usfm_book in executor.map(lambda job: provision_and_parse(*job), jobs)
+            if usfm_book
+        ]
+    logger.debug("Book cache stats: %s", book_cache.book_cache().stats())
     return usfm_books
 
 
+def provision_usfm_book(
+    lang_code: str, resource_type: str, book_code: str
+) -> tuple[Any, str]:
+    """
+    Provision the book's USFM and return its resource lookup DTO and
+    the directory it was provisioned to.
+    """
+    resource_lookup_dto = resource_lookup.usfm_resource_lookup(
+        lang_code,
+        resource_type,
+        book_code,
+    )
+    # Books that live in the same repo must not be cloned or
+    # downloaded into the same directory concurrently.
+    with metrics.stage("provisioning"), provisioning_lock(resource_lookup_dto.url):
+        resource_dir = resource_lookup.provision_asset_files(resource_lookup_dto)
+    return resource_lookup_dto, resource_dir
+
+
+def books_revision(usfm_books: Iterable[TermsBook]) -> str:
+    """
+    Return a token that changes whenever the source, see
+    book_cache.source_revision, of any of usfm_books changes, e.g., to
+    key what was loaded from them by.
+    """
+    revisions = sorted(
+        "{}/{}/{}@{}".format(
+            usfm_book.lang_code,
+            usfm_book.resource_type,
+            usfm_book.book_code,
+            usfm_book.source_revision,
+        )
+        for usfm_book in usfm_books
+    )
+    return hashlib.sha256("\n".join(revisions).encode("utf-8")).hexdigest()[:16]
+
+
+_provisioning_locks: dict[str, threading.Lock] = {}
+_provisioning_locks_lock = threading.Lock()
+
+
+def provisioning_lock(key: str) -> threading.Lock:
+    """Return the lock serializing provisioning of the asset at key."""
+    with _provisioning_locks_lock:
+        return _provisioning_locks.setdefault(key, threading.Lock())
+
+
+@cache
+def parsing_pool(
+    parsing_max_workers: int = dft_settings.USFM_PARSING_MAX_WORKERS,
+) -> Optional[ProcessPoolExecutor]:
+    """
+    Return the process wide pool that parses USFM books, or None if
+    parsing should happen on the calling thread. The pool's processes
+    are spawned rather than forked as the calling process has threads
+    running.
+    """
+    if parsing_max_workers < 1:
+        return None
+    return ProcessPoolExecutor(
+        max_workers=parsing_max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+
+def parse_usfm_book(
+    resource_lookup_dto: Any,
+    resource_dir: str,
+    lang_code: str,
+    resource_type: str,
+    book_code: str,
+    chapters: dict[int, set[int]],
+    use_targeted_usfm_extraction: bool,
+) -> TermsBook:
+    """Parse the book on the parsing pool if there is one."""
+    args = (
+        resource_lookup_dto,
+        resource_dir,
+        lang_code,
+        resource_type,
+        book_code,
+        chapters,
+        use_targeted_usfm_extraction,
+    )
+    pool = parsing_pool()
+    if pool is None:
+        return usfm_extraction.usfm_terms_book(*args)
+    return pool.submit(usfm_extraction.usfm_terms_book, *args).result()
+
+
 @worker.app.task(
     autoretry_for=(Exception,),
     retry_backoff=True,
     retry_kwargs={"max_retries": 3},
 )
 def generate_document(document_request_json: Json[Any]) -> Json[Any]:
-    current_task.update_state(state="Receiving request")
+    progress = ProgressReporter(current_task)
+    progress.phase(TaskProgressPhaseEnum.RECEIVING, "Receiving request")
     document_request = DocumentRequest.parse_raw(document_request_json)
     logger.debug(
         "document_request: %s",
         document_request,
     )
-    lang_code = document_request.lang_code
-    terms = document_request.terms
-    document_request_key_ = ""
-    if terms == "gtf":
-        document_request_key_ = document_request_key(
-            lang_code, "god_the_father_terms", "pdf"
-        )
-        gtf_terms_for_language(lang_code, True, document_request_key_)
-    elif terms == "sog":
-        document_request_key_ = document_request_key(
-            lang_code, "son_of_god_terms", "pdf"
+    # Keep identical requests coalescing onto this task while it runs
+    # and, unless this is its last attempt, while it waits to be retried.
+    # Whether or not it is retried, let other writers of its tables, a
+    # batch member or a warm up, have them in the meantime.
+    last_attempt = current_task.request.retries >= getattr(
+        current_task, "retry_kwargs", {}
+    ).get("max_retries", current_task.max_retries)
+    task_id = current_task.request.id
+    with metrics.stage("generate_document"), (
+        single_flight().held(
+            single_flight_key(document_request),
+            task_id,
+            release_on_error=last_attempt,
         )
-        sog_terms_for_language(lang_code, True, document_request_key_)
-    return document_request_key_
+        if task_id
+        else nullcontext()
+    ), (
+        single_flight().held_all(table_lock_keys(document_request), task_id)
+        if task_id
+        else nullcontext()
+    ):
+        return [
+            terms_document.model_dump()
+            for terms_document in terms_documents_for_request(
+                document_request, progress
+            )
+        ]
 
 
 @worker.app.task(
+    bind=True,
     autoretry_for=(Exception,),
     retry_backoff=True,
     retry_kwargs={"max_retries": 3},
 )
-def generate_docx_document(document_request_json: Json[Any]) -> Json[Any]:
-    current_task.update_state(state="Receiving request")
-    logger.debug("About to parse document request json...")
-    document_request = DocumentRequest.parse_raw(document_request_json)
-    logger.debug(
-        "document_request: %s",
-        document_request,
+def generate_batch(
+    self: Any,
+    batch_request_json: Json[Any],
+    max_workers: int = dft_settings.BATCH_MAX_WORKERS,
+) -> Json[Any]:
+    """
+    Group the languages of the batch by associated gateway language
+    and replace this task with a chord that generates each group's
+    languages in parallel and then collects all of their results, so
+    that this task's id tracks the whole batch.
+    """
+    batch_request = BatchDocumentRequest.parse_raw(batch_request_json)
+    lang_codes = list(unique(batch_request.lang_codes))
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(lang_codes)))
+    ) as executor:
+        gl_lang_codes = list(
+            executor.map(associated_gateway_language_for_heart_language, lang_codes)
+        )
+    groups = groupby(lambda pair: pair[1], zip(lang_codes, gl_lang_codes))
+    logger.debug("Batch gateway language groups: %s", groups)
+    return self.replace(
+        chord(
+            [
+                generate_gateway_language_group.s(
+                    batch_request_json,
+                    gl_lang_code,
+                    [lang_code for lang_code, _ in members],
+                )
+                for gl_lang_code, members in groups.items()
+            ],
+            collect_batch_results.s(),
+        )
     )
+
+
+@worker.app.task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 3},
+)
+def generate_gateway_language_group(
+    batch_request_json: Json[Any],
+    gl_lang_code: Optional[str],
+    lang_codes: list[str],
+    max_workers: int = dft_settings.BATCH_MAX_WORKERS,
+) -> Json[Any]:
+    """
+    Generate the documents of the batch for lang_codes, which all share
+    gl_lang_code as their gateway language, loading the gateway
+    language's books only once. A language that fails is reported in
+    the result rather than failing the rest of the group.
+    """
+    batch_request = BatchDocumentRequest.parse_raw(batch_request_json)
+    document_requests = [
+        batch_request.document_request(lang_code) for lang_code in lang_codes
+    ]
+    gateway = None
+    if any(
+        fresh_terms_documents(document_request) is None
+        for document_request in document_requests
+    ):
+        gateway = (gl_lang_code, gl_usfm_books(gl_lang_code, ALL_TERMS_TABLES))
+
+    def generate(document_request: DocumentRequest) -> BatchMemberResult:
+        try:
+            documents = fresh_terms_documents(document_request)
+            if documents is None:
+                # Don't overlap a generate_document task, or a warm up,
+                # writing any of the same tables. Whichever held a table
+                # before leaves only what is still stale to generate.
+                with single_flight().held_all(
+                    table_lock_keys(document_request), non_coalescable_id("batch")
+                ):
+                    documents = terms_documents_for_request(
+                        document_request, ProgressReporter(None), gateway
+                    )
+        except Exception as exc:
+            logger.exception("Batch member %s failed", document_request.lang_code)
+            return BatchMemberResult(
+                lang_code=document_request.lang_code,
+                gl_lang_code=gl_lang_code,
+                error=str(exc),
+            )
+        return BatchMemberResult(
+            lang_code=document_request.lang_code,
+            gl_lang_code=gl_lang_code,
+            documents=documents,
+        )
+
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(document_requests))),
+        thread_name_prefix="batch",
+    ) as executor:
+        return [
+            result.model_dump() for result in executor.map(generate, document_requests)
+        ]
+
+
+@worker.app.task
+def collect_batch_results(group_results: list[list[Any]]) -> Json[Any]:
+    """Flatten the results of a batch's gateway language groups."""
+    return list(concat(group_results))
+
+
+@worker.app.task
+def prune_output_store(
+    grace_period: int = dft_settings.OUTPUT_STORE_PRUNE_GRACE_PERIOD,
+) -> int:
+    """
+    Delete the documents of the output store that were superseded over
+    grace_period seconds ago and return how many files were deleted.
+    """
+    return output_store.prune(grace_period)
+
+
+def terms_documents_for_request(
+    document_request: DocumentRequest,
+    progress: Optional[ProgressReporter] = None,
+    gateway: Optional[tuple[Optional[str], list[TermsBook]]] = None,
+    terms_tables: Mapping[DocumentRequestTermsEnum, TermsTable] = TERMS_TABLES,
+) -> list[TermsDocument]:
+    """
+    Generate, in one pass, the HTML and whichever of PDF and DOCX
+    document_request asks for of each terms table it requests.
+    """
     lang_code = document_request.lang_code
-    terms = document_request.terms
-    document_request_key_ = ""
-    if terms == "gtf":
-        document_request_key_ = document_request_key(
-            lang_code, "god_the_father_terms", "docx"
+    requested = [
+        (
+            document_request_key(lang_code, terms_tables[terms_enum].table_name),
+            terms_tables[terms_enum],
+        )
+        for terms_enum in document_request.requested_terms()
+    ]
+    return terms_tables_for_language(
+        lang_code,
+        requested,
+        document_request.generate_pdf,
+        document_request.generate_docx,
+        progress,
+        gateway,
+    )
+
+
+def terms_tables_for_language(
+    lang_code: str,
+    requested: Sequence[tuple[str, TermsTable]],
+    generate_pdf: bool,
+    generate_docx: bool,
+    progress: Optional[ProgressReporter] = None,
+    gateway: Optional[tuple[Optional[str], list[TermsBook]]] = None,
+    column_labels: str = COLUMN_LABELS,
+    book_names: Mapping[str, str] = BOOK_NAMES,
+    chatgpt_model: str = dft_settings.CHATGPT_MODEL,
+) -> list[TermsDocument]:
+    """
+    Produce the table of output for each (document_request_key,
+    terms_table) pair in requested for the requested language. The HL
+    and GL books are loaded once for all of the tables and a verse that
+    appears in more than one table is only backtranslated once. Rows
+    whose HL verse is unchanged since the table was last generated, per
+    the table's row manifest, reuse their backtranslation. The
+    HTML of each table is then converted to PDF and/or DOCX
+    concurrently and the documents are published to the output store.
+    Return the documents in the order requested.
+
+    gateway, if given, is the associated gateway language of lang_code
+    and its books, e.g., as loaded once for a batch of languages.
+
+    The gateway language, the rows and each backtranslation are
+    checkpointed as they become available so that, if this fails, a
+    retry resumes where it left off, unless the books the rows were
+    loaded from have changed since. The checkpoint is cleared once the
+    HTML is complete.
+
+    Usage:
+    >>> terms_tables_for_language("ach-SS-acholi", [("ach-SS-acholi_god_the_father_terms", TERMS_TABLES[DocumentRequestTermsEnum.GTF])], False, True)[0].docx
+    'ach-SS-acholi_god_the_father_terms.docx'
+    """
+    if progress is None:
+        progress = ProgressReporter(current_task)
+    stale = []
+    for document_request_key, terms_table in requested:
+        html_filepath_ = document_generator.html_filepath(document_request_key)
+        if asset_file_needs_update(html_filepath_):
+            stale.append((document_request_key, terms_table))
+        else:
+            logger.debug("Cache hit for %s", html_filepath_)
+    if stale:
+        checkpoint_key = "{}:{}".format(
+            "+".join(document_request_key for document_request_key, _ in stale),
+            chatgpt_model,
+        )
+        gl_checkpoint = checkpoint.checkpoint(checkpoint_key)
+        if gateway is None:
+            gl_lang_code = gateway_language(lang_code, progress, gl_checkpoint)
+        else:
+            # The caller, e.g., a batch, has already looked it up.
+            gl_lang_code = gateway[0]
+        hl_usfm_books_, gl_usfm_books_ = load_usfm_books(
+            lang_code,
+            gl_lang_code,
+            [terms_table for _, terms_table in stale],
+            progress,
+            gateway,
+        )
+        # Rows, and the verses backtranslated from them, are only
+        # resumed from if the books they were loaded from are unchanged.
+        checkpoint_ = checkpoint.checkpoint(
+            "{}:{}".format(
+                checkpoint_key,
+                (
+                    books_revision([*hl_usfm_books_, *gl_usfm_books_])
+                    if gl_checkpoint.enabled
+                    else ""
+                ),
+            )
+        )
+        table_rows = checkpoint_.table_rows()
+        if table_rows is not None:
+            logger.debug("Resuming %s from its checkpointed verses", lang_code)
+        else:
+            table_rows = [
+                term_verses(
+                    hl_usfm_books_, gl_usfm_books_, terms_table.terms, book_names
+                )
+                for _, terms_table in stale
+            ]
+            checkpoint_.save_table_rows(gl_lang_code, table_rows)
+        manifests = [
+            RowManifest.read(
+                row_manifest.manifest_filepath(
+                    document_generator.html_filepath(document_request_key)
+                ),
+                gl_lang_code,
+                chatgpt_model,
+            )
+            for document_request_key, _ in stale
+        ]
+        # Verses whose HL verse hasn't changed since their table was
+        # last generated keep their backtranslation.
+        backtranslations: dict[tuple[str, str], Optional[str]] = {}
+        for manifest, rows in zip(manifests, table_rows):
+            for verse_reference, _, hl_verse in rows:
+                backtranslation = manifest.backtranslation(verse_reference, hl_verse)
+                metrics.cache_lookup("row_manifest", bool(backtranslation))
+                if backtranslation:
+                    backtranslations[(verse_reference, hl_verse)] = backtranslation
+        # As do verses backtranslated before a previous attempt failed.
+        checkpointed_backtranslations = checkpoint_.backtranslations()
+        for verse, backtranslation in checkpointed_backtranslations.items():
+            backtranslations.setdefault(verse, backtranslation)
+        # Verses shared by several tables are backtranslated once.
+        verses = [
+            verse
+            for verse in unique(
+                (verse_reference, hl_verse)
+                for rows in table_rows
+                for verse_reference, _, hl_verse in rows
+            )
+            if verse not in backtranslations
+        ]
+        logger.debug(
+            "Reusing %s backtranslations (%s checkpointed), backtranslating %s verses",
+            len(backtranslations),
+            len(checkpointed_backtranslations),
+            len(verses),
         )
-        gtf_terms_for_language(lang_code, True, document_request_key_)
-    elif terms == "sog":
-        document_request_key_ = document_request_key(
-            lang_code, "son_of_god_terms", "docx"
+        header = document_generator.instantiated_html_header_template(
+            "header_enclosing_landscape"
         )
-        sog_terms_for_language(lang_code, True, document_request_key_)
-    return document_request_key_
+        with ExitStack() as stack:
+            writers: list[tuple[TableWriter, str, Sequence[Row]]] = []
+            for (document_request_key, _), rows, manifest in zip(
+                stale, table_rows, manifests
+            ):
+                html_filepath_ = document_generator.html_filepath(document_request_key)
+                if (
+                    all(
+                        (verse_reference, hl_verse) in backtranslations
+                        for verse_reference, _, hl_verse in rows
+                    )
+                    and table_manifest(
+                        rows, backtranslations, gl_lang_code, chatgpt_model
+                    )
+                    == manifest
+                    and os.path.exists(html_filepath_)
+                ):
+                    logger.debug("No rows changed in %s", html_filepath_)
+                    touch_documents(document_request_key)
+                    continue
+                writer = stack.enter_context(
+                    TableWriter(html_filepath_, rows, header, column_labels)
+                )
+                writer.write_ready(backtranslations)
+                writers.append((writer, html_filepath_, rows))
+            progress.phase(
+                TaskProgressPhaseEnum.BACKTRANSLATING,
+                f"Backtranslating {lang_code} verses using AI",
+                len(verses),
+            )
+            for completed, (index, backtranslation) in enumerate(
+                backtranslations_as_completed(verses, lang_code, gl_lang_code),
+                start=1,
+            ):
+                backtranslations[verses[index]] = backtranslation
+                if backtranslation:
+                    checkpoint_.save_backtranslation(verses[index], backtranslation)
+                metrics.VERSES_BACKTRANSLATED.inc()
+                progress.advance(
+                    completed,
+                    f"Backtranslated {lang_code} verse {verses[index][0]} ({completed} of {len(verses)}) using AI",
+                )
+                for writer, _, _ in writers:
+                    writer.write_ready(backtranslations)
+        # The HTML is complete so record what went into it.
+        for _, html_filepath_, written_rows in writers:
+            table_manifest(
+                written_rows, backtranslations, gl_lang_code, chatgpt_model
+            ).write(row_manifest.manifest_filepath(html_filepath_))
+        # From here on the HTML is what a retry resumes from.
+        checkpoint_.clear()
+        gl_checkpoint.clear()
+    conversions: list[tuple[Callable[..., None], tuple[Any, ...]]] = []
+    for document_request_key, terms_table in requested:
+        if generate_pdf:
+            conversions.append((pdf_document, (document_request_key,)))
+        if generate_docx:
+            conversions.append(
+                (docx_document, (lang_code, document_request_key, terms_table.title))
+            )
+    if conversions:
+        progress.phase(
+            TaskProgressPhaseEnum.CONVERTING, "Converting documents", len(conversions)
+        )
+        with ThreadPoolExecutor(
+            max_workers=len(conversions), thread_name_prefix="convert"
+        ) as executor:
+            for completed, future in enumerate(
+                as_completed(
+                    [
+                        executor.submit(conversion, *args)
+                        for conversion, args in conversions
+                    ]
+                ),
+                start=1,
+            ):
+                future.result()
+                progress.advance(
+                    completed,
+                    f"Converted {completed} of {len(conversions)} documents",
+                )
+    with metrics.stage("publishing"):
+        for document_request_key, _ in requested:
+            output_store.publish(document_generator.html_filepath(document_request_key))
+            if generate_pdf:
+                output_store.publish(
+                    document_generator.pdf_filepath(document_request_key)
+                )
+            if generate_docx:
+                output_store.publish(
+                    document_generator.docx_filepath(document_request_key)
+                )
+    return [
+        terms_document(document_request_key, generate_pdf, generate_docx)
+        for document_request_key, _ in requested
+    ]
+
+
+def gateway_language(
+    lang_code: str, progress: ProgressReporter, checkpoint_: checkpoint.Checkpoint
+) -> Optional[str]:
+    """
+    Return lang_code's associated gateway language, as checkpointed
+    or, if it wasn't, as looked up, in which case it is checkpointed
+    straight away as loading the books takes a while and may fail.
+    """
+    gl_checkpointed, gl_lang_code = checkpoint_.gl_lang_code()
+    if not gl_checkpointed:
+        progress.phase(
+            TaskProgressPhaseEnum.GATEWAY_LANGUAGE,
+            "Getting associated gateway language",
+        )
+        gl_lang_code = associated_gateway_language_for_heart_language(lang_code)
+        checkpoint_.save_gl_lang_code(gl_lang_code)
+    return gl_lang_code
+
+
+def load_usfm_books(
+    lang_code: str,
+    gl_lang_code: Optional[str],
+    terms_tables: Sequence[TermsTable],
+    progress: ProgressReporter,
+    gateway: Optional[tuple[Optional[str], list[TermsBook]]],
+) -> tuple[list[TermsBook], list[TermsBook]]:
+    """
+    Return the books of lang_code that terms_tables use and the books
+    of gl_lang_code, loading the latter unless gateway gives them.
+    """
+    # Load the HL books while the GL books are loaded.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        logger.debug("About to get data for heart language: %s", lang_code)
+        hl_usfm_books_future = executor.submit(
+            hl_usfm_books,
+            lang_code,
+            [terms_table.terms for terms_table in terms_tables],
+        )
+        gl_usfm_books_future: Future[list[TermsBook]]
+        if gateway is None:
+            logger.debug("About to get data for gateway language: %s", gl_lang_code)
+            # GL books are loaded with the verses of every terms table
+            # so that the cached books serve any table.
+            gl_usfm_books_future = executor.submit(
+                gl_usfm_books, gl_lang_code, ALL_TERMS_TABLES
+            )
+        else:
+            # The caller, e.g., a batch, has already loaded them.
+            gl_usfm_books_future = Future()
+            gl_usfm_books_future.set_result(gateway[1])
+        progress.phase(TaskProgressPhaseEnum.LOADING_BOOKS, "Loading books")
+        return hl_usfm_books_future.result(), gl_usfm_books_future.result()
+
+
+def table_manifest(
+    rows: Sequence[Row],
+    backtranslations: Mapping[tuple[str, str], Optional[str]],
+    gl_lang_code: Optional[str],
+    chatgpt_model: str,
+) -> RowManifest:
+    return RowManifest.from_rows(
+        gl_lang_code,
+        chatgpt_model,
+        rows,
+        [
+            backtranslations[(verse_reference, hl_verse)]
+            for verse_reference, _, hl_verse in rows
+        ],
+    )
+
+
+def touch_documents(document_request_key: str) -> None:
+    """
+    Mark the HTML of a table none of whose rows changed, along with
+    the PDF and DOCX converted from it, as fresh again.
+    """
+    html_filepath_ = document_generator.html_filepath(document_request_key)
+    html_mtime = os.path.getmtime(html_filepath_)
+    now = time.time()
+    os.utime(html_filepath_, (now, now))
+    for filepath in (
+        document_generator.pdf_filepath(document_request_key),
+        document_generator.docx_filepath(document_request_key),
+    ):
+        if os.path.exists(filepath) and os.path.getmtime(filepath) >= html_mtime:
+            os.utime(filepath, (now, now))
+
+
+def pdf_document(document_request_key: str) -> None:
+    """Convert the terms table's HTML to PDF unless the PDF is fresh."""
+    html_filepath_ = document_generator.html_filepath(document_request_key)
+    pdf_filepath_ = document_generator.pdf_filepath(document_request_key)
+    # If the document has previously been generated and is fresh enough,
+    # immediately return pre-built PDF.
+    if document_needs_update(pdf_filepath_, html_filepath_):
+        with metrics.stage("pdf_conversion"):
+            document_generator.convert_html_to_pdf(
+                html_filepath_,
+                pdf_filepath_,
+                document_request_key,
+            )
+
+
+def docx_document(lang_code: str, document_request_key: str, title2: str) -> None:
+    """Convert the terms table's HTML to DOCX unless the DOCX is fresh."""
+    html_filepath_ = document_generator.html_filepath(document_request_key)
+    docx_filepath_ = document_generator.docx_filepath(document_request_key)
+    if document_needs_update(docx_filepath_, html_filepath_):
+        with metrics.stage("docx_composition"):
+            # Read the HTML back rather than relying on it having been
+            # generated in this pass as it may have been a cache hit.
+            with open(html_filepath_, encoding="utf-8") as fin:
+                enclosed_content = fin.read()
+            doc = Document()
+            composer = Composer(doc)
+            subdoc = assembly_strategy_utils.create_docx_subdoc(
+                enclosed_content, lang_code, False, False
+            )
+            composer.append(subdoc)
+            title1 = "Language: " + lang_code
+            document_generator.convert_html_to_docx(
+                html_filepath_,
+                docx_filepath_,
+                composer,
+                False,
+                title1,
+                title2,
+                "Formatted for Translators",
+                "template.docx",
+            )
 
 
 def gtf_terms_for_language(
@@ -312,100 +877,16 @@ def gtf_terms_for_language(
     >>> #gtf_terms_for_language("adh")
     >>> gtf_terms_for_language("ach-SS-acholi", True, )
     """
-    # filename = f"{lang_code}_{html_filename_part}"
-    # document_request_key_ = document_request_key(
-    #     lang_code, html_filename_part, "docx" if docx_p else "pdf"
-    # )
-    html_filepath_ = document_generator.html_filepath(document_request_key)
-    pdf_filepath_ = document_generator.pdf_filepath(document_request_key)
-    docx_filepath_ = document_generator.docx_filepath(document_request_key)
-    enclosed_content = ""
-    if asset_file_needs_update(html_filepath_):
-        output_table: list[str] = []
-        output_table.append(column_labels)
-        current_task.update_state(state="Getting associated gateway language")
-        gl_lang_code = associated_gateway_language_for_heart_language(lang_code)
-        logger.debug("About to get data for heart language: %s", lang_code)
-        logger.debug("About to get data for gateway language: %s", gl_lang_code)
-        gl_usfm_books_ = gl_usfm_books(gl_lang_code)
-        for hl_usfm_book in hl_usfm_books(lang_code):
-            gl_usfm_book = associated_gl_usfm_book(
-                gl_usfm_books_, hl_usfm_book.book_code
-            )
-            hl_gtf_chapters, gl_gtf_chapters = chapter_verse_lists(
-                hl_usfm_book, gl_usfm_book, terms
-            )
-            for hl_gtf_chapter_num, hl_gtf_verse_nums in hl_gtf_chapters.items():
-                for hl_verse_num in hl_gtf_verse_nums:
-                    hl_verse = (
-                        hl_usfm_book.chapters[hl_gtf_chapter_num].verses[
-                            str(hl_verse_num)
-                        ]
-                        if hl_usfm_book
-                        and hl_gtf_chapter_num in hl_usfm_book.chapters.keys()
-                        and str(hl_verse_num)
-                        in hl_usfm_book.chapters[hl_gtf_chapter_num].verses.keys()
-                        else ""
-                    )
-                    gl_verse = (
-                        gl_usfm_book.chapters[hl_gtf_chapter_num].verses[
-                            str(hl_verse_num)
-                        ]
-                        if gl_usfm_book
-                        and hl_gtf_chapter_num in gl_usfm_book.chapters.keys()
-                        and str(hl_verse_num)
-                        in gl_usfm_book.chapters[hl_gtf_chapter_num].verses.keys()
-                        else ""
-                    )
-                    verse_reference = f"{book_names[hl_usfm_book.book_code]} {hl_gtf_chapter_num}:{hl_verse_num}"
-                    current_task.update_state(
-                        state=f"Backtranslating {lang_code} verse {verse_reference} using AI"
-                    )
-                    backtranslation = backtranslate(
-                        hl_verse, verse_reference, lang_code, gl_lang_code
-                    )
-                    output_table.append(
-                        # The last column in the row is the empty comments column
-                        f"<tr><td>{verse_reference}</td><td>{gl_verse}</td><td>{hl_verse}</td><td>{backtranslation}</td><td></td></tr>\n"
-                    )
-        content = f"<table>\n{''.join(output_table)}</table>"
-        header = document_generator.instantiated_html_header_template(
-            "header_enclosing_landscape"
-        )
-        enclosed_content = document_generator.enclose_html_content(content, header)
-        document_generator.write_html_content_to_file(
-            enclosed_content,
-            html_filepath_,
-        )
-    else:
-        logger.debug("Cache hit for %s", html_filepath_)
-    # If the document has previously been generated and is fresh enough,
-    # immediately return pre-built PDF.
-    if not docx_p and asset_file_needs_update(pdf_filepath_):
-        document_generator.convert_html_to_pdf(
-            html_filepath_,
-            pdf_filepath_,
-            document_request_key,
-        )
-    if docx_p and asset_file_needs_update(docx_filepath_):
-        doc = Document()
-        composer = Composer(doc)
-        subdoc = assembly_strategy_utils.create_docx_subdoc(
-            enclosed_content, lang_code, False, False
-        )
-        composer.append(subdoc)
-        title1 = "Language: " + lang_code
-        document_generator.convert_html_to_docx(
-            html_filepath_,
-            docx_filepath_,
-            composer,
-            False,
-            title1,
-            title2,
-            "Formatted for Translators",
-            "template.docx",
-        )
-    return document_request_key
+    return terms_tables_for_language(
+        lang_code,
+        # The table's name is only used to make document_request_key
+        # which the caller has already done.
+        [(document_request_key, TermsTable("", title2, terms))],
+        not docx_p,
+        docx_p,
+        column_labels=column_labels,
+        book_names=book_names,
+    )[0].document_request_key
 
 
 def sog_terms_for_language(
@@ -441,54 +922,120 @@ def sog_terms_for_language(
     )
 
 
+def usfm_book_codes_and_types(
+    lang_code: str,
+    terms_tables: Sequence[dict[str, dict[int, list[int]]]],
+    usfm_resource_types: Sequence[str],
+) -> tuple[list[str], list[tuple[str, str]]]:
+    """
+    Return the codes of lang_code's books that terms_tables use and
+    lang_code's USFM resource types, and their names, among
+    usfm_resource_types.
+    """
+    book_codes = [
+        book_code[0]
+        for book_code in resource_lookup.book_codes_for_lang(lang_code)
+        if any(book_code[0] in terms for terms in terms_tables)
+    ]
+    usfm_resource_types_and_names = [
+        resource_type_and_name
+        for resource_type_and_name in resource_types_and_names_for_lang(lang_code)
+        if resource_type_and_name[0] in usfm_resource_types
+    ]
+    return book_codes, usfm_resource_types_and_names
+
+
+def usfm_book_sources(
+    lang_code: str,
+    terms_tables: Sequence[dict[str, dict[int, list[int]]]],
+    usfm_resource_types: Sequence[str],
+) -> list[tuple[str, str]]:
+    """
+    Return the (book code, resource type) of each of lang_code's USFM
+    books that terms_tables use, as usfm_books provisions them.
+    """
+    book_codes, usfm_resource_types_and_names = usfm_book_codes_and_types(
+        lang_code, terms_tables, usfm_resource_types
+    )
+    return [
+        (book_code, resource_type)
+        for book_code in book_codes
+        for resource_type, _ in usfm_resource_types_and_names
+    ]
+
+
 def gl_usfm_books(
     gl_lang_code: Optional[str],
+    terms_tables: Sequence[dict[str, dict[int, list[int]]]],
     gl_usfm_resource_types: Sequence[str] = settings.ALL_USFM_RESOURCE_TYPES,
-) -> list[USFMBook]:
-    gl_book_codes = []
-    gl_usfm_books: list[USFMBook] = []
+) -> list[TermsBook]:
+    gl_usfm_books: list[TermsBook] = []
     if gl_lang_code:
-        gl_book_codes = [
-            book_code[0]
-            for book_code in resource_lookup.book_codes_for_lang(gl_lang_code)
-            if book_code[0] in gtf_terms_table.keys()
-        ]
-        gl_usfm_resource_types_and_names = [
-            resource_type_and_name
-            for resource_type_and_name in resource_types_and_names_for_lang(
-                gl_lang_code
-            )
-            if resource_type_and_name[0] in gl_usfm_resource_types
-        ]
+        gl_book_codes, gl_usfm_resource_types_and_names = usfm_book_codes_and_types(
+            gl_lang_code, terms_tables, gl_usfm_resource_types
+        )
         gl_usfm_books = usfm_books(
-            gl_book_codes, gl_usfm_resource_types_and_names, gl_lang_code
+            gl_book_codes, gl_usfm_resource_types_and_names, gl_lang_code, terms_tables
         )
     return gl_usfm_books
 
 
 def hl_usfm_books(
     lang_code: str,
+    terms_tables: Sequence[dict[str, dict[int, list[int]]]],
     usfm_resource_types: Sequence[str] = settings.USFM_RESOURCE_TYPES,
-) -> list[USFMBook]:
-    hl_book_codes = [
-        book_code[0]
-        for book_code in resource_lookup.book_codes_for_lang(lang_code)
-        if book_code[0] in gtf_terms_table.keys()
-    ]
-    hl_usfm_resource_types_and_names = [
-        resource_type_and_name
-        for resource_type_and_name in resource_types_and_names_for_lang(lang_code)
-        if resource_type_and_name[0] in usfm_resource_types
-    ]
+) -> list[TermsBook]:
+    hl_book_codes, hl_usfm_resource_types_and_names = usfm_book_codes_and_types(
+        lang_code, terms_tables, usfm_resource_types
+    )
     hl_usfm_books = usfm_books(
-        hl_book_codes, hl_usfm_resource_types_and_names, lang_code
+        hl_book_codes, hl_usfm_resource_types_and_names, lang_code, terms_tables
     )
     return hl_usfm_books
 
 
+def term_verses(
+    hl_usfm_books: list[TermsBook],
+    gl_usfm_books: list[TermsBook],
+    terms: dict[str, dict[int, list[int]]],
+    book_names: Mapping[str, str] = BOOK_NAMES,
+) -> list[tuple[str, str, str]]:
+    """
+    Return a (verse_reference, gl_verse, hl_verse) tuple, in table
+    order, for each verse in terms found in hl_usfm_books.
+    """
+    rows = []
+    for hl_usfm_book in hl_usfm_books:
+        gl_usfm_book = associated_gl_usfm_book(gl_usfm_books, hl_usfm_book.book_code)
+        hl_gtf_chapters, gl_gtf_chapters = chapter_verse_lists(
+            hl_usfm_book, gl_usfm_book, terms
+        )
+        for hl_gtf_chapter_num, hl_gtf_verse_nums in hl_gtf_chapters.items():
+            for hl_verse_num in hl_gtf_verse_nums:
+                hl_verse = (
+                    hl_usfm_book.chapters[hl_gtf_chapter_num].verses[str(hl_verse_num)]
+                    if hl_usfm_book
+                    and hl_gtf_chapter_num in hl_usfm_book.chapters.keys()
+                    and str(hl_verse_num)
+                    in hl_usfm_book.chapters[hl_gtf_chapter_num].verses.keys()
+                    else ""
+                )
+                gl_verse = (
+                    gl_usfm_book.chapters[hl_gtf_chapter_num].verses[str(hl_verse_num)]
+                    if gl_usfm_book
+                    and hl_gtf_chapter_num in gl_usfm_book.chapters.keys()
+                    and str(hl_verse_num)
+                    in gl_usfm_book.chapters[hl_gtf_chapter_num].verses.keys()
+                    else ""
+                )
+                verse_reference = f"{book_names[hl_usfm_book.book_code]} {hl_gtf_chapter_num}:{hl_verse_num}"
+                rows.append((verse_reference, gl_verse, hl_verse))
+    return rows
+
+
 def associated_gl_usfm_book(
-    gl_usfm_books: list[USFMBook], book_code: str
-) -> Optional[USFMBook]:
+    gl_usfm_books: list[TermsBook], book_code: str
+) -> Optional[TermsBook]:
     usfm_books = [
         gl_usfm_book
         for gl_usfm_book in gl_usfm_books
@@ -498,8 +1045,8 @@ def associated_gl_usfm_book(
 
 
 def chapter_verse_lists(
-    hl_usfm_book: USFMBook,
-    gl_usfm_book: Optional[USFMBook],
+    hl_usfm_book: TermsBook,
+    gl_usfm_book: Optional[TermsBook],
     terms: dict[str, dict[int, list[int]]],
 ) -> tuple[dict[int, list[int]], dict[int, list[int]]]:
     # Get the per chapter verse lists for the current book
@@ -533,57 +1080,12 @@ def chapter_verse_lists(
     return hl_gtf_chapters, gl_gtf_chapters
 
 
-def backtranslate(
-    hl_verse_html: str,
-    verse_reference: str,
-    lang_code: str,
-    gl_lang_code: Optional[str],
-    use_ai: bool = dft_settings.USE_AI,
-    chatgpt_model: str = "gpt-3.5-turbo",
-) -> Optional[str]:
-    backtranslation: Optional[str] = ""
-    if hl_verse_html and gl_lang_code and use_ai:
-        prompt = "Translate {}: '{}' from {} language to {} language".format(
-            verse_reference,
-            BeautifulSoup(hl_verse_html, "lxml").get_text(),
-            lang_code,
-            gl_lang_code,
-        )
-        # OPENAI_API_KEY gets picked up from env automatically
-        chat_completion = openai.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model=chatgpt_model,
-        )
-        backtranslation = chat_completion.choices[0].message.content
-    return backtranslation
-
-
-def document_request_key(
-    lang_code: str,
-    table_name: str,
-    doc_type: str,
-    underscore: str = "_",
-) -> str:
-    """
-    Create and return the document_request_key. The
-    document_request_key uniquely identifies a document request.
-    """
-    document_request_key = underscore.join([lang_code, table_name, doc_type])
-    return document_request_key
-
-
 # def main() -> None:
 #     gtf_terms_for_language("ach-SS-acholi", True, "foo")
 #     sog_terms_for_language("ziw", True, "bar")
 
 
 if __name__ == "__main__":
-
     # To run the doctests in the this module, in the root of the
     # project do something like:
     # FROM_EMAIL_ADDRESS=... python backend/usfm_checker.py
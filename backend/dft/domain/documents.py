@@ -0,0 +1,311 @@
+"""
+This module provides what the API needs to know of document requests
+without importing the code that fulfills them, which pulls in DOCX
+composition, the AI client, HTML parsing and most of the DOC package:
+the terms tables and the keys of their documents, whether the requested
+documents are already fresh, the languages on offer, the names of the
+tasks to enqueue, and the popularity of languages.
+
+Workers import dft_checker, which defines those tasks, and the API
+enqueues them by name, so neither the API's startup time nor its memory
+pays for the worker's dependencies. The documents' files are named
+here as DOC's document_generator names them, in DOCUMENT_OUTPUT_DIR
+after their document_request_key, so that answering a request from
+them doesn't import it either.
+"""
+
+import os
+import time
+from typing import Mapping, Optional, Sequence, cast
+
+import redis
+from dft.domain import data_api, output_store
+from dft.domain.god_the_father_terms import gtf_terms_table
+from dft.domain.model import (
+    DocumentRequest,
+    DocumentRequestTermsEnum,
+    TermsDocument,
+    TermsTable,
+)
+from dft.domain.redis_client import redis_client
+from dft.domain.son_of_god_terms import sog_terms_table
+from document.config import settings
+from graphql import DocumentNode
+from pydantic import HttpUrl
+from toolz import unique  # type: ignore
+
+logger = settings.logger(__name__)
+
+# The names, as registered by celery, of the tasks in dft_checker.
+GENERATE_DOCUMENT_TASK = "dft.domain.dft_checker.generate_document"
+GENERATE_BATCH_TASK = "dft.domain.dft_checker.generate_batch"
+
+USAGE_KEY = "dft:usage:lang_codes"
+
+TERMS_TABLES: dict[DocumentRequestTermsEnum, TermsTable] = {
+    DocumentRequestTermsEnum.GTF: TermsTable(
+        "god_the_father_terms", "God the Father Terms", gtf_terms_table
+    ),
+    DocumentRequestTermsEnum.SOG: TermsTable(
+        "son_of_god_terms", "Son of God Terms", sog_terms_table
+    ),
+}
+
+
+ALL_TERMS_TABLES: list[dict[str, dict[int, list[int]]]] = [
+    terms_table.terms for terms_table in TERMS_TABLES.values()
+]
+
+
+async def lang_codes_and_names(
+    # WAITING Needed to download translations.json for other functions where data API is not mature enough yet:
+    working_dir: str = settings.RESOURCE_ASSETS_DIR,
+    # WAITING Needed to download translations.json for other functions where data API is not mature enough yet:
+    translations_json_location: HttpUrl = settings.TRANSLATIONS_JSON_LOCATION,
+    lang_code_filter_list: Sequence[str] = settings.LANG_CODE_FILTER_LIST,
+    gateway_languages: Sequence[str] = settings.GATEWAY_LANGUAGES,
+    graphql_query: DocumentNode = data_api.LANGUAGES_QUERY,
+) -> Sequence[tuple[str, str, bool]]:
+    """
+    >>> from document.domain import resource_lookup
+    >>> # data = await resource_lookup.lang_codes_and_names2()
+    >>> # data[0]
+    ('abz', 'Abui', False)
+    """
+
+    # WAITING Needed to download translations.json for other functions
+    # where data API is not mature enough yet. Remove when data API can
+    # fully replace translations.json. For now this will make the app
+    # slower.
+    # data = fetch_source_data(working_dir, str(translations_json_location))
+
+    data = await data_api.execute_async(graphql_query)
+    languages_info = None
+    values = []
+    try:
+        languages_info = data["content"]
+        # logger.debug("data['content'][0]: %s", languages_info)
+        for language_info in languages_info:
+            language = language_info["language"]
+            ietf_code = language["ietf_code"]
+            english_name = language["english_name"]
+            national_name = language["national_name"]
+            is_gateway = ietf_code in gateway_languages
+            if ietf_code not in lang_code_filter_list:
+                if english_name in national_name:
+                    logger.debug(
+                        "About to add: %s", (ietf_code, national_name, is_gateway)
+                    )
+                    values.append((ietf_code, national_name, is_gateway))
+                else:
+                    logger.debug(
+                        "About to add: %s",
+                        (ietf_code, f"{national_name} ({english_name})", is_gateway),
+                    )
+                    values.append(
+                        (ietf_code, f"{national_name} ({english_name})", is_gateway)
+                    )
+
+    except:
+        logger.exception("Failed due to the following exception")
+    unique_values = unique(values, key=lambda value: value[0])
+    # heart_langs = [
+    #     unique_value for unique_value in unique_values if not unique_value[2]
+    # ]
+    # logger.debug("heart_langs: %s", heart_langs)
+    return sorted(unique_values, key=lambda value: value[1])
+
+
+def single_flight_key(
+    document_request: DocumentRequest,
+    terms_tables: Mapping[DocumentRequestTermsEnum, TermsTable] = TERMS_TABLES,
+) -> str:
+    """
+    Return the key under which identical document requests are
+    coalesced: the document request keys of the requested tables along
+    with the requested document types. Writers of the documents
+    exclude each other with table_lock_keys instead.
+
+    >>> single_flight_key(DocumentRequest(lang_code="tpi", terms="all", generate_docx=True))
+    'tpi_god_the_father_terms+tpi_son_of_god_terms:pdf+docx'
+    """
+    doc_types = [
+        doc_type
+        for doc_type, requested in (
+            ("pdf", document_request.generate_pdf),
+            ("docx", document_request.generate_docx),
+        )
+        if requested
+    ]
+    document_request_keys = [
+        document_request_key(
+            document_request.lang_code, terms_tables[terms_enum].table_name
+        )
+        for terms_enum in document_request.requested_terms()
+    ]
+    return f"{'+'.join(document_request_keys)}:{'+'.join(doc_types)}"
+
+
+def table_lock_keys(
+    document_request: DocumentRequest,
+    terms_tables: Mapping[DocumentRequestTermsEnum, TermsTable] = TERMS_TABLES,
+) -> list[str]:
+    """
+    Return, sorted, the keys of the locks that whoever writes
+    document_request's documents holds: one per requested table, its
+    document request key, whatever the document types, so that any two
+    writers of a table's files exclude each other.
+
+    >>> table_lock_keys(DocumentRequest(lang_code="tpi", terms="all"))
+    ['tpi_god_the_father_terms', 'tpi_son_of_god_terms']
+    """
+    return sorted(
+        {
+            document_request_key(
+                document_request.lang_code, terms_tables[terms_enum].table_name
+            )
+            for terms_enum in document_request.requested_terms()
+        }
+    )
+
+
+def fresh_terms_documents(
+    document_request: DocumentRequest,
+    terms_tables: Mapping[DocumentRequestTermsEnum, TermsTable] = TERMS_TABLES,
+) -> Optional[list[TermsDocument]]:
+    """
+    Return the documents document_request asks for if every one of
+    them has already been generated and is still fresh, otherwise
+    None. This only looks at the output directory so that it is cheap
+    enough for the API to call before deciding to enqueue a task.
+    """
+    documents = []
+    for terms_enum in document_request.requested_terms():
+        document_request_key_ = document_request_key(
+            document_request.lang_code, terms_tables[terms_enum].table_name
+        )
+        html_filepath_ = document_filepath(document_request_key_, "html")
+        if asset_file_needs_update(html_filepath_):
+            return None
+        for generate, filepath in (
+            (
+                document_request.generate_pdf,
+                document_filepath(document_request_key_, "pdf"),
+            ),
+            (
+                document_request.generate_docx,
+                document_filepath(document_request_key_, "docx"),
+            ),
+        ):
+            if generate and document_needs_update(filepath, html_filepath_):
+                return None
+        documents.append(
+            terms_document(
+                document_request_key_,
+                document_request.generate_pdf,
+                document_request.generate_docx,
+            )
+        )
+    return documents or None
+
+
+def terms_document(
+    document_request_key: str, generate_pdf: bool, generate_docx: bool
+) -> TermsDocument:
+    """
+    Return the names of the documents of the terms table as published
+    to the output store or, if they haven't been, e.g., as they were
+    generated before there was one, as generated.
+    """
+
+    def name(extension: str) -> str:
+        filepath = document_filepath(document_request_key, extension)
+        return output_store.published_name(filepath) or os.path.basename(filepath)
+
+    return TermsDocument(
+        document_request_key=document_request_key,
+        html=name("html"),
+        pdf=name("pdf") if generate_pdf else None,
+        docx=name("docx") if generate_docx else None,
+    )
+
+
+def document_filepath(
+    document_request_key: str,
+    extension: str,
+    output_dir: str = settings.DOCUMENT_OUTPUT_DIR,
+) -> str:
+    """
+    Return the path of the document_request_key's document with the
+    given extension, html, pdf or docx, as DOC's document_generator
+    names it.
+
+    >>> document_filepath("tpi_god_the_father_terms", "pdf", "output")
+    'output/tpi_god_the_father_terms.pdf'
+    """
+    return os.path.join(output_dir, f"{document_request_key}.{extension}")
+
+
+def asset_file_needs_update(filepath: str) -> bool:
+    """
+    Return True if the file at filepath is missing or, as DOC's
+    file_utils.asset_file_needs_update decides, is older than
+    ASSET_CACHING_PERIOD hours or caching is disabled.
+    """
+    if not settings.ASSET_CACHING_ENABLED or not os.path.exists(filepath):
+        return True
+    return time.time() - os.path.getmtime(filepath) > (
+        settings.ASSET_CACHING_PERIOD * 60 * 60
+    )
+
+
+def document_needs_update(filepath: str, html_filepath: str) -> bool:
+    """
+    Return True if the document at filepath, which is converted from
+    the HTML at html_filepath, is missing, expired, or older than the
+    HTML.
+    """
+    return asset_file_needs_update(filepath) or (
+        os.path.getmtime(filepath) < os.path.getmtime(html_filepath)
+    )
+
+
+def document_request_key(
+    lang_code: str,
+    table_name: str,
+    underscore: str = "_",
+) -> str:
+    """
+    Create and return the document_request_key. The
+    document_request_key uniquely identifies a document request. The
+    HTML, PDF, and DOCX of the request are all named after it.
+
+    >>> document_request_key("tpi", "god_the_father_terms")
+    'tpi_god_the_father_terms'
+    """
+    document_request_key = underscore.join([lang_code, table_name])
+    return document_request_key
+
+
+def record_usage(lang_code: str, usage_key: str = USAGE_KEY) -> None:
+    """Count a document request for lang_code towards its popularity."""
+    try:
+        redis_client().zincrby(usage_key, 1, lang_code)
+    except redis.RedisError:
+        logger.exception("Could not record usage of %s", lang_code)
+
+
+def popular_lang_codes(limit: int, usage_key: str = USAGE_KEY) -> list[str]:
+    """Return the limit most requested language codes, most requested first."""
+    if limit < 1:
+        return []
+    try:
+        return [
+            lang_code.decode("utf-8") if isinstance(lang_code, bytes) else lang_code
+            for lang_code in cast(
+                list[bytes], redis_client().zrevrange(usage_key, 0, limit - 1)
+            )
+        ]
+    except redis.RedisError:
+        logger.exception("Could not get popular languages")
+        return []
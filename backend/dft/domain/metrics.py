@@ -0,0 +1,127 @@
+"""
+This module provides the Prometheus metrics of the API and the workers:
+latency histograms of each stage of generating a document and of the
+API's handlers, counters of verses backtranslated, cache lookups and
+task and AI call retries, and gauges of the stages and requests in progress.
+
+Processes that share a PROMETHEUS_MULTIPROC_DIR, e.g., gunicorn's
+workers or celery's prefork pool, report their metrics together. The
+API serves them at /metrics and each celery worker serves them from a
+sidecar HTTP server on WORKER_METRICS_PORT.
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+from celery.signals import task_retry, worker_process_shutdown, worker_ready
+from dft.config import dft_settings
+from document.config import settings
+from prometheus_client import (
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    multiprocess,
+    start_http_server,
+)
+
+logger = settings.logger(__name__)
+
+# From a cached lookup to converting a whole NT to PDF.
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+STAGE_SECONDS = Histogram(
+    "dft_stage_seconds",
+    "Seconds taken by each stage of generating documents",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+STAGES_IN_PROGRESS = Gauge(
+    "dft_stages_in_progress",
+    "Stages of generating documents in progress",
+    ["stage"],
+    multiprocess_mode="livesum",
+)
+VERSES_BACKTRANSLATED = Counter(
+    "dft_verses_backtranslated",
+    "Verses backtranslated, whether by AI or from a cache",
+)
+CACHE_LOOKUPS = Counter(
+    "dft_cache_lookups",
+    "Lookups of each cache by whether they hit",
+    ["cache", "result"],
+)
+AI_RETRIES = Counter(
+    "dft_ai_retries",
+    "Retries of calls to the AI by the error that failed them",
+    ["error"],
+)
+TASK_RETRIES = Counter(
+    "dft_task_retries",
+    "Retries of each celery task",
+    ["task"],
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "dft_http_request_seconds",
+    "Seconds taken by the API to respond, by route",
+    ["method", "route", "status"],
+)
+HTTP_REQUESTS_IN_PROGRESS = Gauge(
+    "dft_http_requests_in_progress",
+    "API requests in progress",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Record the time taken by the block as stage name."""
+    STAGES_IN_PROGRESS.labels(name).inc()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(name).observe(time.perf_counter() - start)
+        STAGES_IN_PROGRESS.labels(name).dec()
+
+
+def cache_lookup(cache: str, hit: bool) -> None:
+    """Count a lookup in cache."""
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def registry() -> CollectorRegistry:
+    """
+    Return the registry of this process's metrics or, in multiprocess
+    mode, of the metrics of all the processes sharing its
+    PROMETHEUS_MULTIPROC_DIR.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry_ = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry_)  # type: ignore[no-untyped-call]
+    return registry_
+
+
+@task_retry.connect
+def count_retry(sender: Any = None, **kwargs: Any) -> None:
+    TASK_RETRIES.labels(getattr(sender, "name", "unknown")).inc()
+
+
+@worker_ready.connect
+def serve_worker_metrics(
+    worker_metrics_port: int = dft_settings.WORKER_METRICS_PORT, **kwargs: Any
+) -> None:
+    if worker_metrics_port:
+        start_http_server(worker_metrics_port, registry=registry())
+        logger.info("Serving metrics on port %s", worker_metrics_port)
+
+
+@worker_process_shutdown.connect
+def mark_process_dead(pid: Any = None, **kwargs: Any) -> None:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid or os.getpid())  # type: ignore[no-untyped-call]
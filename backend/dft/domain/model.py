@@ -6,7 +6,7 @@ validation and JSON serialization.
 """
 
 from enum import Enum
-from typing import Any, NamedTuple, Optional, Sequence, Union, final
+from typing import Annotated, Any, NamedTuple, Optional, Sequence, Union, final
 
 # from document.config import settings
 
@@ -14,14 +14,15 @@ from typing import Any, NamedTuple, Optional, Sequence, Union, final
 # from document.utils.number_utils import is_even
 # from docx import Document  # type: ignore
 # from more_itertools import all_equal
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 # from pydantic.functional_validators import model_validator
 from toolz import itertoolz  # type: ignore
 
 # These type aliases give us more self-documenting code, but of course
 # aren't strictly necessary.
-# HtmlContent = str
+HtmlContent = str
+ChapterNum = int
 
 
 # @final
@@ -74,6 +75,8 @@ class DocumentRequestTermsEnum(str, Enum):
 
     GTF = "gtf"
     SOG = "sog"
+    # Every terms table, generated in a single pass.
+    ALL = "all"
 
 
 @final
@@ -90,7 +93,13 @@ class DocumentRequest(BaseModel):
     # document request.
     # layout_for_print: bool = False
     lang_code: str
-    terms: DocumentRequestTermsEnum
+    # One terms table, a non-empty list of them, or ALL. Requesting
+    # several tables at once shares the loading of books and
+    # backtranslation of verses between them.
+    terms: Union[
+        DocumentRequestTermsEnum,
+        Annotated[list[DocumentRequestTermsEnum], Field(min_length=1)],
+    ]
     # resource_requests: Sequence[ResourceRequest]
     # Indicate whether PDF should be generated.
     generate_pdf: bool = True
@@ -105,6 +114,22 @@ class DocumentRequest(BaseModel):
     # expected results.
     document_request_source: DocumentRequestSourceEnum = DocumentRequestSourceEnum.TEST
 
+    def requested_terms(self) -> list[DocumentRequestTermsEnum]:
+        """
+        Return the distinct terms tables requested in canonical order
+        with ALL expanded.
+
+        >>> DocumentRequest(lang_code="tpi", terms=["sog", "gtf", "sog"]).requested_terms()
+        [<DocumentRequestTermsEnum.GTF: 'gtf'>, <DocumentRequestTermsEnum.SOG: 'sog'>]
+        """
+        terms = self.terms if isinstance(self.terms, list) else [self.terms]
+        return [
+            terms_enum
+            for terms_enum in DocumentRequestTermsEnum
+            if terms_enum != DocumentRequestTermsEnum.ALL
+            and (terms_enum in terms or DocumentRequestTermsEnum.ALL in terms)
+        ]
+
     # @model_validator(mode="after")
     # def ensure_valid_document_request(self) -> Any:
     #     """
@@ -162,6 +187,129 @@ class DocumentRequest(BaseModel):
     #     return self
 
 
+@final
+class TermsTable(NamedTuple):
+    """A terms table along with how its document is named and titled."""
+
+    # Used in the document request key, e.g., god_the_father_terms.
+    table_name: str
+    title: str
+    # Verse numbers, keyed by book code and then chapter number.
+    terms: dict[str, dict[int, list[int]]]
+
+
+@final
+class BatchDocumentRequest(BaseModel):
+    """
+    This class reifies a request, e.g., from a coordinator, for the
+    same terms tables and document types in many languages at once.
+    """
+
+    email_address: Optional[EmailStr] = None
+    lang_codes: Annotated[list[str], Field(min_length=1)]
+    terms: Union[
+        DocumentRequestTermsEnum,
+        Annotated[list[DocumentRequestTermsEnum], Field(min_length=1)],
+    ]
+    generate_pdf: bool = True
+    generate_docx: bool = False
+    document_request_source: DocumentRequestSourceEnum = DocumentRequestSourceEnum.TEST
+
+    def document_request(self, lang_code: str) -> DocumentRequest:
+        """Return the part of this batch that is for lang_code."""
+        return DocumentRequest(
+            email_address=self.email_address,
+            lang_code=lang_code,
+            terms=self.terms,
+            generate_pdf=self.generate_pdf,
+            generate_docx=self.generate_docx,
+            document_request_source=self.document_request_source,
+        )
+
+
+@final
+class TaskProgressPhaseEnum(str, Enum):
+    """
+    The phases a document generation task goes through, in order.
+    """
+
+    RECEIVING = "receiving"
+    GATEWAY_LANGUAGE = "gateway_language"
+    LOADING_BOOKS = "loading_books"
+    BACKTRANSLATING = "backtranslating"
+    CONVERTING = "converting"
+
+
+@final
+class TaskProgress(BaseModel):
+    """
+    The progress of a document generation task as reported in its
+    celery meta and by /task_status.
+    """
+
+    phase: TaskProgressPhaseEnum
+    # Human readable description, also used as the task's state.
+    label: str
+    completed: int = 0
+    # None when the phase has no countable steps.
+    total: Optional[int] = None
+    # Estimated seconds left in the phase, if known.
+    eta: Optional[float] = None
+
+
+@final
+class TermsDocument(BaseModel):
+    """
+    The documents generated for a terms table. Documents are named
+    relative to the file server and are None when not requested.
+    """
+
+    document_request_key: str
+    html: str
+    pdf: Optional[str] = None
+    docx: Optional[str] = None
+
+
+@final
+class BatchMemberResult(BaseModel):
+    """
+    The outcome of generating one language's documents in a batch:
+    either its documents or the error that prevented them.
+    """
+
+    lang_code: str
+    gl_lang_code: Optional[str]
+    documents: list[TermsDocument] = []
+    error: Optional[str] = None
+
+
+@final
+class TermsChapter(BaseModel):
+    """
+    The verses, keyed by verse number, of a chapter that are needed by
+    the terms tables.
+    """
+
+    verses: dict[str, HtmlContent]
+
+
+@final
+class TermsBook(BaseModel):
+    """
+    The subset of a USFM book's verses that are needed by the terms
+    tables. Unlike document.domain.model.USFMBook only the chapters
+    and verses that appear in a terms table are held.
+    """
+
+    lang_code: str
+    resource_type: str
+    book_code: str
+    chapters: dict[ChapterNum, TermsChapter]
+    # The revision, see book_cache.source_revision, of the source the
+    # book was loaded from.
+    source_revision: str = ""
+
+
 # @final
 # class Attachment(NamedTuple):
 #     """
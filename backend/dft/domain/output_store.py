@@ -0,0 +1,218 @@
+"""
+This module provides the content addressed store of generated documents
+served by the file server. Each document is published as an object
+named after the hash of its content, e.g.,
+objects/2c/2c26b46b...html, which never changes once written, so that
+the file server can give it a strong ETag and clients and proxies can
+cache it indefinitely. Documents whose content is unchanged when
+regenerated share an object.
+
+A pointer file per document, e.g., refs/tpi_god_the_father_terms.html,
+names the object currently published for it. Objects of the HTML are
+also written precompressed, .gz and .br, for the file server to serve
+as is, in the manner of nginx's gzip_static, rather than uncompressed.
+
+The documents themselves stay where they are generated as their
+modification times drive the freshness checks in dft_checker.
+
+Objects no pointer file names any longer, e.g., as their document was
+regenerated with different content, are pruned once they are older
+than a grace period that outlasts downloads of them still in flight.
+"""
+
+import gzip
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Optional, Sequence
+
+import brotli  # type: ignore
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+OBJECTS_DIR = "objects"
+REFS_DIR = "refs"
+# Suffixes of the precompressed variants of an object.
+VARIANT_SUFFIXES = (".gz", ".br")
+
+
+def file_hash(filepath: str, chunk_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 of the content of the file at filepath."""
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as fin:
+        while chunk := fin.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def object_name(digest: str, suffix: str) -> str:
+    """
+    Return the name, relative to the output directory, of the object
+    with content hash digest of a document with suffix, sharded by the
+    hash's first byte to keep directories small.
+
+    >>> object_name("2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae", ".html")
+    'objects/2c/2c26b46b68ffc68ff99b453c1d30413413422d706483bfa0f98a5e886266e7ae.html'
+    """
+    return f"{OBJECTS_DIR}/{digest[:2]}/{digest}{suffix}"
+
+
+def ref_filepath(filepath: str, output_dir: str = settings.DOCUMENT_OUTPUT_DIR) -> str:
+    """
+    >>> ref_filepath("document_output/tpi_god_the_father_terms.html", "document_output")
+    'document_output/refs/tpi_god_the_father_terms.html'
+    """
+    return os.path.join(output_dir, REFS_DIR, Path(filepath).name)
+
+
+def write_atomically(filepath: str, content: bytes) -> None:
+    """
+    Write content to filepath such that readers, e.g., the file
+    server, never see a partial file.
+    """
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    fd, tmp_filepath = tempfile.mkstemp(
+        dir=os.path.dirname(filepath), prefix=".", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(fd, "wb") as fout:
+            fout.write(content)
+        # mkstemp creates files only the owner can read.
+        os.chmod(tmp_filepath, 0o644)
+        os.replace(tmp_filepath, filepath)
+    except BaseException:
+        os.unlink(tmp_filepath)
+        raise
+
+
+def published_name(
+    filepath: str, output_dir: str = settings.DOCUMENT_OUTPUT_DIR
+) -> Optional[str]:
+    """
+    Return the name, relative to the output directory, of the object
+    published for the document at filepath, or None if the document
+    hasn't been published since it was last written.
+    """
+    ref_filepath_ = ref_filepath(filepath, output_dir)
+    try:
+        if os.path.getmtime(ref_filepath_) < os.path.getmtime(filepath):
+            return None
+        with open(ref_filepath_, encoding="utf-8") as fin:
+            return fin.read().strip() or None
+    except OSError:
+        return None
+
+
+def publish(
+    filepath: str,
+    output_dir: str = settings.DOCUMENT_OUTPUT_DIR,
+    precompressed_suffixes: Sequence[str] = (".html",),
+) -> str:
+    """
+    Publish the document at filepath to the store, unless it already
+    is, and return the name of its object relative to the output
+    directory. Objects of documents with one of precompressed_suffixes
+    are also written gzipped and brotli compressed.
+    """
+    name = published_name(filepath, output_dir)
+    if name:
+        return name
+    suffix = Path(filepath).suffix
+    name = object_name(file_hash(filepath), suffix)
+    object_filepath = os.path.join(output_dir, name)
+    if os.path.exists(object_filepath):
+        logger.debug("%s is unchanged as %s", filepath, name)
+        # The object may have been unreferenced for a while, so that it
+        # mustn't look old enough to prune now that it is referenced.
+        touch_object(object_filepath)
+    else:
+        with open(filepath, "rb") as fin:
+            content = fin.read()
+        if suffix in precompressed_suffixes:
+            # Fixed mtime so that identical content compresses identically.
+            write_atomically(
+                f"{object_filepath}.gz",
+                gzip.compress(content, compresslevel=9, mtime=0),
+            )
+            write_atomically(f"{object_filepath}.br", brotli.compress(content))
+        # The object is written last as its existence marks the object
+        # and its variants as complete.
+        write_atomically(object_filepath, content)
+        logger.debug("Published %s as %s", filepath, name)
+    write_atomically(ref_filepath(filepath, output_dir), name.encode("utf-8"))
+    return name
+
+
+def touch_object(object_filepath: str) -> None:
+    """Mark the object at object_filepath, and its variants, as just written."""
+    for filepath in (
+        object_filepath,
+        *(f"{object_filepath}{suffix}" for suffix in VARIANT_SUFFIXES),
+    ):
+        try:
+            os.utime(filepath)
+        except FileNotFoundError:
+            pass
+
+
+def referenced_names(output_dir: str = settings.DOCUMENT_OUTPUT_DIR) -> set[str]:
+    """Return the names of the objects the pointer files name."""
+    names = set()
+    try:
+        with os.scandir(os.path.join(output_dir, REFS_DIR)) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.startswith("."):
+                    with open(entry.path, encoding="utf-8") as fin:
+                        names.add(fin.read().strip())
+    except FileNotFoundError:
+        pass
+    return names
+
+
+def prune(
+    grace_period: float,
+    output_dir: str = settings.DOCUMENT_OUTPUT_DIR,
+) -> int:
+    """
+    Delete the objects, and their variants, that no pointer file names
+    and that haven't been written for grace_period seconds, along with
+    temporary files left behind by writes that didn't complete. Return
+    the number of files deleted.
+    """
+    objects_dir = os.path.join(output_dir, OBJECTS_DIR)
+    if not os.path.isdir(objects_dir):
+        return 0
+    cutoff = time.time() - grace_period
+    # Candidates are found before the pointer files are read, and
+    # checked again before they are deleted, so that an object
+    # published in between, which publish touches before pointing to
+    # it, is either recent or referenced.
+    candidates = []
+    for dirpath, _, filenames in os.walk(objects_dir):
+        for filename in filenames:
+            filepath = os.path.join(dirpath, filename)
+            try:
+                if os.path.getmtime(filepath) < cutoff:
+                    candidates.append(filepath)
+            except FileNotFoundError:
+                pass
+    referenced = referenced_names(output_dir)
+    pruned = 0
+    for filepath in candidates:
+        name = Path(os.path.relpath(filepath, output_dir)).as_posix()
+        for suffix in VARIANT_SUFFIXES:
+            name = name.removesuffix(suffix)
+        if name in referenced:
+            continue
+        try:
+            if os.path.getmtime(filepath) >= cutoff:
+                continue
+            os.unlink(filepath)
+        except FileNotFoundError:
+            continue
+        pruned += 1
+    logger.info("Pruned %s files from %s", pruned, objects_dir)
+    return pruned
@@ -0,0 +1,96 @@
+"""
+This module provides throttled, structured progress reporting for the
+celery tasks that generate documents. Progress is published as the
+task's state, a human readable label that existing clients display,
+along with a TaskProgress payload in the task's meta from which
+clients can compute a percentage and ETA. Each report is also pushed
+to the clients streaming the task's status (see task_events).
+"""
+
+import time
+from typing import Any, Callable, Optional
+
+from dft.config import dft_settings
+from dft.domain.model import TaskProgress, TaskProgressPhaseEnum
+from dft.domain.task_events import publish_task_event
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+
+class ProgressReporter:
+    """
+    Report the progress of task. Entering a phase and completing one
+    are always reported; progress within a phase is reported at most
+    once every min_interval seconds and only once min_steps more steps
+    have completed, so that a task backtranslating thousands of verses
+    doesn't write its state to the result backend thousands of times.
+    """
+
+    def __init__(
+        self,
+        task: Any,
+        min_interval: float = dft_settings.PROGRESS_REPORT_MIN_INTERVAL,
+        min_steps: int = dft_settings.PROGRESS_REPORT_MIN_STEPS,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self._task = task
+        self._min_interval = min_interval
+        self._min_steps = max(1, min_steps)
+        self._clock = clock
+        self._phase = TaskProgressPhaseEnum.RECEIVING
+        self._total: Optional[int] = None
+        self._phase_started = clock()
+        self._last_reported = float("-inf")
+        self._last_completed = 0
+        self.reports = 0
+
+    def phase(
+        self, phase: TaskProgressPhaseEnum, label: str, total: Optional[int] = None
+    ) -> None:
+        """Enter phase which, if total is given, has total steps."""
+        self._phase = phase
+        self._total = total
+        self._phase_started = self._clock()
+        self._last_completed = 0
+        self._report(label, 0)
+
+    def advance(self, completed: int, label: str) -> None:
+        """Report that completed steps of the current phase are done."""
+        now = self._clock()
+        if completed != self._total and (
+            now - self._last_reported < self._min_interval
+            or completed - self._last_completed < self._min_steps
+        ):
+            return
+        self._report(label, completed)
+
+    def eta(self, completed: int) -> Optional[float]:
+        """
+        Return the estimated seconds left in the current phase given
+        the rate at which it has progressed so far.
+        """
+        if not self._total or not completed:
+            return None
+        elapsed = self._clock() - self._phase_started
+        return round(elapsed / completed * (self._total - completed), 1)
+
+    def _report(self, label: str, completed: int) -> None:
+        self._last_reported = self._clock()
+        self._last_completed = completed
+        progress = TaskProgress(
+            phase=self._phase,
+            label=label,
+            completed=completed,
+            total=self._total,
+            eta=self.eta(completed),
+        )
+        task_id = getattr(getattr(self._task, "request", None), "id", None)
+        if task_id is None:
+            # Not running as a celery task, e.g., from a script.
+            logger.debug("Progress: %s", progress)
+            return
+        self.reports += 1
+        meta = progress.model_dump(mode="json")
+        self._task.update_state(state=label, meta=meta)
+        publish_task_event(task_id, {"state": label, "progress": meta})
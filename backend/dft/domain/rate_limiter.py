@@ -0,0 +1,176 @@
+"""
+This module provides a rate limiter, shared via Redis by every worker
+process on every host, that budgets calls to the AI by both requests
+and tokens per minute so that together the workers stay within the
+provider's limits rather than each finding them out via 429s.
+
+Each budget is a token bucket which refills continuously at its per
+minute rate up to burst seconds' worth. A call waits until both
+buckets can cover it. When the provider rate limits a call anyway
+every caller pauses for as long as the provider asked. A per minute
+limit of 0 disables limiting, e.g., where there is no Redis.
+"""
+
+import time
+from functools import cache
+from typing import Callable, Optional, cast
+
+import redis
+from dft.config import dft_settings
+from dft.domain.redis_client import redis_client
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+# Return the seconds to wait before the request can be made, having
+# taken its cost from the buckets if that is 0. A forced request is
+# always taken, possibly leaving the token bucket in debt, e.g., to
+# settle a call that used more tokens than estimated. Numbers are
+# returned as strings as Redis truncates Lua numbers to integers.
+ACQUIRE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local paused_until = tonumber(redis.call("get", KEYS[2]) or "0")
+local force = ARGV[7] == "1"
+if paused_until > now and not force then
+    return tostring(paused_until - now)
+end
+local requests_per_minute = tonumber(ARGV[2])
+local tokens_per_minute = tonumber(ARGV[3])
+local burst = tonumber(ARGV[4])
+local requests_capacity = requests_per_minute * burst / 60
+local tokens_capacity = tokens_per_minute * burst / 60
+local state = redis.call("hmget", KEYS[1], "requests", "tokens", "updated")
+local requests = tonumber(state[1]) or requests_capacity
+local tokens = tonumber(state[2]) or tokens_capacity
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+requests = math.min(requests_capacity, requests + elapsed * requests_per_minute / 60)
+tokens = math.min(tokens_capacity, tokens + elapsed * tokens_per_minute / 60)
+local requests_needed = tonumber(ARGV[5])
+-- A call costing more than the bucket holds waits for a full bucket.
+local tokens_needed = tonumber(ARGV[6])
+local wait = 0
+if not force then
+    tokens_needed = math.min(tokens_needed, tokens_capacity)
+    if requests < requests_needed then
+        wait = (requests_needed - requests) * 60 / requests_per_minute
+    end
+    if tokens < tokens_needed then
+        wait = math.max(wait, (tokens_needed - tokens) * 60 / tokens_per_minute)
+    end
+end
+if wait == 0 then
+    requests = requests - requests_needed
+    tokens = tokens - tokens_needed
+end
+redis.call("hset", KEYS[1], "requests", tostring(requests), "tokens", tostring(tokens), "updated", tostring(now))
+redis.call("expire", KEYS[1], math.ceil(burst) + 60)
+return tostring(wait)
+"""
+
+
+class RateLimiter:
+    """
+    Requests and tokens per minute budgets, in Redis, of calls to the
+    AI model named key.
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        key: str,
+        requests_per_minute: int,
+        tokens_per_minute: int,
+        burst: float = 10.0,
+        key_prefix: str = "dft:rate_limit:",
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._bucket_key = f"{key_prefix}{key}"
+        self._paused_key = f"{key_prefix}{key}:paused_until"
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._client = client
+        self._enabled = requests_per_minute > 0 and tokens_per_minute > 0
+        self._acquire = client.register_script(ACQUIRE_SCRIPT)
+
+    def _take(self, requests: int, tokens: int, force: bool = False) -> float:
+        return float(
+            self._acquire(
+                keys=[self._bucket_key, self._paused_key],
+                args=[
+                    repr(self._clock()),
+                    self._requests_per_minute,
+                    self._tokens_per_minute,
+                    self._burst,
+                    requests,
+                    tokens,
+                    "1" if force else "0",
+                ],
+            )
+        )
+
+    def acquire(self, tokens: int) -> float:
+        """
+        Block until a call estimated to use tokens tokens is within
+        budget and return the seconds waited. Redis being unavailable
+        doesn't block or fail the call, it only disables limiting.
+        """
+        waited = 0.0
+        while self._enabled:
+            try:
+                wait = self._take(1, tokens)
+            except redis.RedisError:
+                logger.exception("Could not acquire rate limit, not limiting")
+                return waited
+            if wait <= 0:
+                return waited
+            self._sleep(wait)
+            waited += wait
+        return waited
+
+    def settle(self, estimated_tokens: int, actual_tokens: int) -> None:
+        """
+        Charge, or refund, the difference between the tokens a call
+        was estimated to use and those it actually used.
+        """
+        if not self._enabled or actual_tokens == estimated_tokens:
+            return
+        try:
+            self._take(0, actual_tokens - estimated_tokens, force=True)
+        except redis.RedisError:
+            logger.exception("Could not settle rate limit")
+
+    def pause(self, seconds: float) -> None:
+        """
+        Hold back every call, e.g., because the provider asked to retry
+        after seconds, unless a longer pause is already in place. If
+        the pause can't be shared only the caller is held back.
+        """
+        if not self._enabled:
+            self._sleep(seconds)
+            return
+        until = self._clock() + seconds
+        try:
+            paused_until = cast(Optional[bytes], self._client.get(self._paused_key))
+            if paused_until is None or float(paused_until) < until:
+                self._client.set(
+                    self._paused_key, repr(until), px=max(1, int(seconds * 1000))
+                )
+        except redis.RedisError:
+            logger.exception("Could not pause rate limit")
+            self._sleep(seconds)
+
+
+@cache
+def rate_limiter(
+    chatgpt_model: str = dft_settings.CHATGPT_MODEL,
+    requests_per_minute: int = dft_settings.AI_REQUESTS_PER_MINUTE,
+    tokens_per_minute: int = dft_settings.AI_TOKENS_PER_MINUTE,
+) -> RateLimiter:
+    """Return this process's RateLimiter of calls to chatgpt_model."""
+    return RateLimiter(
+        redis_client(), chatgpt_model, requests_per_minute, tokens_per_minute
+    )
@@ -0,0 +1,18 @@
+"""This module provides access to the Redis instance shared by the API and workers."""
+
+from functools import cache
+
+import redis
+from dft.config import dft_settings
+
+
+@cache
+def redis_client(redis_url: str = dft_settings.REDIS_URL) -> redis.Redis:
+    """
+    Return the process wide Redis client for redis_url. The client's
+    connection pool notices when it has been inherited across a fork,
+    e.g., by celery's prefork pool, and reconnects, so it is safe to
+    share at module level.
+    """
+    # redis 5.0.1 annotates Redis.from_url as returning None.
+    return redis.Redis.from_url(redis_url)  # type: ignore[return-value]
@@ -0,0 +1,141 @@
+"""
+This module provides the per row manifest kept next to each generated
+terms table. For each row the manifest records hashes of the HL verse,
+GL verse and backtranslation that went into it, along with the
+backtranslation itself, so that regenerating a stale table only
+backtranslates the rows whose HL verse changed and a table none of
+whose rows changed needn't be rewritten at all.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Optional, Sequence, final
+
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+# (verse_reference, gl_verse, hl_verse)
+Row = tuple[str, str, str]
+
+
+def content_hash(text: str) -> str:
+    """
+    >>> content_hash("foo")[:12]
+    '2c26b46b68ff'
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def manifest_filepath(html_filepath: str) -> str:
+    """
+    >>> manifest_filepath("document_output/tpi_god_the_father_terms.html")
+    'document_output/tpi_god_the_father_terms.manifest.json'
+    """
+    return str(Path(html_filepath).with_suffix(".manifest.json"))
+
+
+@final
+class RowManifest:
+    """
+    The rows, in table order, of a terms table generated for a gateway
+    language with a given AI model.
+    """
+
+    def __init__(
+        self,
+        gl_lang_code: Optional[str],
+        chatgpt_model: str,
+        rows: Sequence[dict[str, str]] = (),
+    ) -> None:
+        self.gl_lang_code = gl_lang_code
+        self.chatgpt_model = chatgpt_model
+        self.rows = list(rows)
+        self._backtranslations = {
+            (row["verse_reference"], row["hl_hash"]): row["backtranslation"]
+            for row in self.rows
+            if row["backtranslation"]
+            and content_hash(row["backtranslation"]) == row["backtranslation_hash"]
+        }
+
+    @classmethod
+    def from_rows(
+        cls,
+        gl_lang_code: Optional[str],
+        chatgpt_model: str,
+        rows: Sequence[Row],
+        backtranslations: Sequence[Optional[str]],
+    ) -> "RowManifest":
+        return cls(
+            gl_lang_code,
+            chatgpt_model,
+            [
+                {
+                    "verse_reference": verse_reference,
+                    "hl_hash": content_hash(hl_verse),
+                    "gl_hash": content_hash(gl_verse),
+                    "backtranslation_hash": content_hash(backtranslation or ""),
+                    "backtranslation": backtranslation or "",
+                }
+                for (verse_reference, gl_verse, hl_verse), backtranslation in zip(
+                    rows, backtranslations
+                )
+            ],
+        )
+
+    @classmethod
+    def read(
+        cls, path: str, gl_lang_code: Optional[str], chatgpt_model: str
+    ) -> "RowManifest":
+        """
+        Return the manifest at path, or an empty one if there isn't a
+        readable manifest there or it was made for a different gateway
+        language or AI model.
+        """
+        try:
+            with open(path, encoding="utf-8") as fin:
+                data: dict[str, Any] = json.load(fin)
+            if (
+                data["gl_lang_code"] == gl_lang_code
+                and data["chatgpt_model"] == chatgpt_model
+            ):
+                return cls(gl_lang_code, chatgpt_model, data["rows"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError, TypeError):
+            logger.exception("Ignoring unreadable row manifest %s", path)
+        return cls(gl_lang_code, chatgpt_model)
+
+    def write(self, path: str) -> None:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fout:
+                json.dump(
+                    {
+                        "gl_lang_code": self.gl_lang_code,
+                        "chatgpt_model": self.chatgpt_model,
+                        "rows": self.rows,
+                    },
+                    fout,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, path)
+        except OSError:
+            logger.exception("Could not write row manifest %s", path)
+
+    def backtranslation(self, verse_reference: str, hl_verse: str) -> Optional[str]:
+        """
+        Return the backtranslation recorded for verse_reference if its
+        HL verse hasn't changed since.
+        """
+        return self._backtranslations.get((verse_reference, content_hash(hl_verse)))
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, RowManifest)
+            and self.gl_lang_code == other.gl_lang_code
+            and self.chatgpt_model == other.chatgpt_model
+            and self.rows == other.rows
+        )
@@ -0,0 +1,215 @@
+"""
+This module provides single-flight coalescing of identical document
+requests across API processes via Redis. The first request for a key
+claims it with the id of the task it is about to enqueue; identical
+requests that arrive while that task is in flight get its id back
+rather than enqueueing a task of their own.
+
+A claim taken when a task is enqueued lasts long enough for the task
+to wait its turn in the queue. Once the task runs, the claim expires
+after ttl seconds unless the worker running it keeps renewing it, so a
+claim held by a worker that died is released on its own. A task that
+fails and is retried keeps its claim across the retry's backoff.
+
+Whoever writes a table's documents, a generate_document task, a batch
+member or a warm up, also holds a lock on the table, whatever document
+types it writes, so that no two writers of the same files overlap. The
+locks are claims too, of the tables' document request keys, taken in
+sorted order; a batch member or a warm up holds them under a
+non-coalescable id as it has no task for requests to wait on.
+"""
+
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from functools import cache
+from typing import Iterable, Iterator, Optional, Union, cast
+
+import redis
+from dft.config import dft_settings
+from dft.domain.redis_client import redis_client
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+# Only touch the claim if it is still held by the given task so that a
+# task whose claim expired and was taken over can't clobber the new
+# holder's.
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+# Prefix of the ids of holders of claims that requests can't be
+# coalesced onto.
+NON_COALESCABLE_PREFIX = "non-coalescable:"
+
+RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("expire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """Claims, in Redis, of keys by the ids of the tasks computing them."""
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        ttl: int,
+        key_prefix: str = "dft:inflight:",
+    ) -> None:
+        self._client = client
+        self._ttl = ttl
+        self._key_prefix = key_prefix
+        self._release = client.register_script(RELEASE_SCRIPT)
+        self._renew = client.register_script(RENEW_SCRIPT)
+
+    def claim(self, key: str, task_id: str, ttl: Optional[int] = None) -> Optional[str]:
+        """
+        Claim key for task_id, for ttl seconds if given rather than the
+        default, and return None, or, if key is already claimed, return
+        the id of the task holding it.
+        """
+        redis_key = f"{self._key_prefix}{key}"
+        while True:
+            if self._client.set(redis_key, task_id, nx=True, ex=ttl or self._ttl):
+                return None
+            holder = cast(Union[bytes, str, None], self._client.get(redis_key))
+            # The claim may have been released in between.
+            if holder is not None:
+                return holder.decode("utf-8") if isinstance(holder, bytes) else holder
+
+    def claim_all(self, keys: Iterable[str], task_id: str) -> Optional[str]:
+        """
+        Claim all of keys, in sorted order, for task_id and return None
+        or, if one of them is already claimed, release those just
+        claimed and return the id of the task holding it.
+        """
+        claimed: list[str] = []
+        for key in sorted(set(keys)):
+            holder = self.claim(key, task_id)
+            if holder is not None:
+                for claimed_key in claimed:
+                    self.release(claimed_key, task_id)
+                return holder
+            claimed.append(key)
+        return None
+
+    def release(self, key: str, task_id: str) -> None:
+        """Release key if task_id still holds it."""
+        self._release(keys=[f"{self._key_prefix}{key}"], args=[task_id])
+
+    def renew(self, key: str, task_id: str) -> bool:
+        """
+        Extend task_id's claim of key by another ttl seconds, taking
+        the claim if no one holds it. Return False if someone else
+        holds it.
+        """
+        redis_key = f"{self._key_prefix}{key}"
+        if self._renew(keys=[redis_key], args=[task_id, self._ttl]):
+            return True
+        return bool(self._client.set(redis_key, task_id, nx=True, ex=self._ttl))
+
+    def acquire(
+        self, key: str, task_id: str, timeout: float, poll_interval: float = 1.0
+    ) -> bool:
+        """
+        Claim key for task_id, or renew task_id's claim of it, waiting
+        up to timeout seconds for whoever else holds it to release it.
+        Return whether task_id holds the claim.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.renew(key, task_id):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(poll_interval)
+        return True
+
+    @contextmanager
+    def held(
+        self,
+        key: str,
+        task_id: str,
+        release_on_error: bool = True,
+        wait: Optional[float] = None,
+    ) -> Iterator[None]:
+        """
+        Hold task_id's claim of key, renewing it every third of ttl, for
+        the duration of the block and release it afterwards or, if the
+        block raises and not release_on_error, e.g., as the task will be
+        retried, renew it once more so that it outlasts the retry's
+        backoff. If someone else holds the claim, wait up to wait
+        seconds, by default ttl, for them to release it before entering
+        the block regardless. Redis being unavailable doesn't fail the
+        block, it only disables coalescing.
+        """
+        try:
+            if not self.acquire(key, task_id, self._ttl if wait is None else wait):
+                logger.warning("Gave up waiting for the claim of %s", key)
+        except redis.RedisError:
+            logger.exception("Could not claim %s", key)
+        stopped = threading.Event()
+
+        def keep_renewing() -> None:
+            while not stopped.wait(self._ttl / 3):
+                try:
+                    if not self.renew(key, task_id):
+                        logger.warning("Claim of %s was taken over", key)
+                except redis.RedisError:
+                    logger.exception("Could not renew claim of %s", key)
+
+        renewer = threading.Thread(
+            target=keep_renewing, name="single-flight", daemon=True
+        )
+        renewer.start()
+        release = True
+        try:
+            yield
+        except BaseException:
+            release = release_on_error
+            raise
+        finally:
+            stopped.set()
+            renewer.join()
+            try:
+                if release:
+                    self.release(key, task_id)
+                else:
+                    self.renew(key, task_id)
+            except redis.RedisError:
+                logger.exception("Could not release or renew claim of %s", key)
+
+    @contextmanager
+    def held_all(
+        self, keys: Iterable[str], task_id: str, wait: Optional[float] = None
+    ) -> Iterator[None]:
+        """
+        Hold task_id's claims of keys, as held does, taking them in
+        sorted order so that holders of overlapping sets of keys can't
+        deadlock waiting for each other.
+        """
+        with ExitStack() as stack:
+            for key in sorted(set(keys)):
+                stack.enter_context(self.held(key, task_id, wait=wait))
+            yield
+
+
+@cache
+def single_flight(
+    ttl: int = dft_settings.DOCUMENT_REQUEST_CLAIM_TTL,
+) -> SingleFlight:
+    """Return this process's SingleFlight."""
+    return SingleFlight(redis_client(), ttl)
+
+
+def non_coalescable_id(owner: str) -> str:
+    """
+    Return a unique id, for owner, e.g., "batch", under which to claim
+    keys that requests can't be coalesced onto.
+    """
+    return f"{NON_COALESCABLE_PREFIX}{owner}:{uuid.uuid4()}"
@@ -0,0 +1,150 @@
+"""
+This module provides a stale-while-revalidate cache of a JSON document
+computed by an expensive coroutine, e.g., the list of languages fetched
+from the data API. The serialized document, its ETag and Last-Modified
+time are computed once per refresh so that serving it is just returning
+bytes.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, NamedTuple, Optional, final
+
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+
+@final
+class Snapshot(NamedTuple):
+    """A serialized JSON document along with its HTTP validators."""
+
+    body: bytes
+    etag: str
+    # Seconds since the epoch when body last changed.
+    last_modified: float
+    # Seconds since the epoch when body was last (re)computed.
+    fetched_at: float
+
+
+class SnapshotCache:
+    """
+    Hold the latest Snapshot of what loader returns. Once the snapshot
+    is older than ttl seconds the stale snapshot continues to be served
+    while a single background refresh runs. A successful refresh is
+    also written to snapshot_path so that, after a restart or while the
+    upstream is down, the last good snapshot can still be served. A
+    loader that raises or returns an empty result is treated as a
+    failed refresh and is not retried for retry_interval seconds.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: int,
+        snapshot_path: str,
+        retry_interval: int = 30,
+    ) -> None:
+        self._loader = loader
+        self._ttl = ttl
+        self._retry_interval = retry_interval
+        self._last_refresh_started = 0.0
+        self._snapshot_path = Path(snapshot_path)
+        self._snapshot: Optional[Snapshot] = None
+        self._refresh_task: Optional[asyncio.Task[None]] = None
+
+    async def get(self) -> Optional[Snapshot]:
+        """
+        Return the current snapshot, only waiting on the loader when
+        there has never been a snapshot.
+        """
+        if self._snapshot is None:
+            self._snapshot = self._read_snapshot()
+        if self._snapshot is None:
+            # Nothing to serve yet so all callers wait on one refresh.
+            await asyncio.shield(self.refresh())
+        elif (
+            time.time() - self._snapshot.fetched_at > self._ttl
+            and time.time() - self._last_refresh_started > self._retry_interval
+        ):
+            self.refresh()
+        return self._snapshot
+
+    def refresh(self) -> "asyncio.Task[None]":
+        """Start a background refresh unless one is already running."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._last_refresh_started = time.time()
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    async def _refresh(self) -> None:
+        try:
+            value = await self._loader()
+        except Exception:
+            logger.exception("Refreshing snapshot failed, serving last good snapshot")
+            return
+        if not value:
+            logger.debug("Refresh returned no data, serving last good snapshot")
+            return
+        body = json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode(
+            "utf-8"
+        )
+        etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        now = time.time()
+        last_modified = (
+            self._snapshot.last_modified
+            if self._snapshot and self._snapshot.etag == etag
+            else now
+        )
+        self._snapshot = Snapshot(body, etag, last_modified, now)
+        self._write_snapshot(self._snapshot)
+
+    def _read_snapshot(self) -> Optional[Snapshot]:
+        try:
+            body = self._snapshot_path.read_bytes()
+        except OSError:
+            return None
+        mtime = self._snapshot_path.stat().st_mtime
+        logger.debug("Loaded snapshot from %s", self._snapshot_path)
+        return Snapshot(
+            body, f'"{hashlib.sha256(body).hexdigest()[:32]}"', mtime, mtime
+        )
+
+    def _write_snapshot(self, snapshot: Snapshot) -> None:
+        try:
+            self._snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._snapshot_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_bytes(snapshot.body)
+            os.utime(tmp_path, (snapshot.last_modified, snapshot.last_modified))
+            tmp_path.replace(self._snapshot_path)
+        except OSError:
+            logger.exception("Could not write snapshot to %s", self._snapshot_path)
+
+
+def not_modified(
+    snapshot: Snapshot,
+    if_none_match: Optional[str],
+    if_modified_since: Optional[float],
+) -> bool:
+    """
+    Return True if a client holding the given validators already has
+    snapshot. If-None-Match takes precedence over If-Modified-Since per
+    RFC 9110.
+
+    >>> snapshot = Snapshot(b"[]", '"abc"', 100.0, 100.0)
+    >>> not_modified(snapshot, 'W/"abc", "def"', None)
+    True
+    >>> not_modified(snapshot, None, 99.0)
+    False
+    """
+    if if_none_match is not None:
+        etags = {etag.strip().removeprefix("W/") for etag in if_none_match.split(",")}
+        return "*" in etags or snapshot.etag in etags
+    if if_modified_since is not None:
+        # HTTP dates have whole second resolution.
+        return int(snapshot.last_modified) <= if_modified_since
+    return False
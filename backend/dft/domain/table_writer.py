@@ -0,0 +1,132 @@
+"""
+This module provides the incremental writing of a terms table's HTML
+so that rows are written out as their backtranslations arrive rather
+than the whole document being built up in memory first.
+"""
+
+import os
+import tempfile
+import time
+from types import TracebackType
+from typing import Mapping, Optional, Sequence
+
+from dft.domain import metrics
+from dft.domain.row_manifest import Row
+from document.config import settings
+from document.domain import document_generator
+
+logger = settings.logger(__name__)
+
+# Stands in for the table when splitting the enclosing HTML around it.
+CONTENT_PLACEHOLDER = "\x00content\x00"
+
+
+def table_row(
+    verse_reference: str, gl_verse: str, hl_verse: str, backtranslation: Optional[str]
+) -> str:
+    """
+    >>> table_row("Matthew 1:1", "gl", "hl", "bt")
+    '<tr><td>Matthew 1:1</td><td>gl</td><td>hl</td><td>bt</td><td></td></tr>\\n'
+    """
+    # The last column in the row is the empty comments column
+    return f"<tr><td>{verse_reference}</td><td>{gl_verse}</td><td>{hl_verse}</td><td>{backtranslation}</td><td></td></tr>\n"
+
+
+def enclosing_html(header: str) -> tuple[str, str]:
+    """
+    Return the HTML that document_generator.enclose_html_content puts
+    before and after the content it encloses with header.
+    """
+    before, after = document_generator.enclose_html_content(
+        CONTENT_PLACEHOLDER, header
+    ).split(CONTENT_PLACEHOLDER)
+    return before, after
+
+
+class TableWriter:
+    """
+    Write the HTML of the table of rows to html_filepath in table order,
+    each row as soon as its backtranslation is available. Until the
+    table is complete it is written to a .partial file next to
+    html_filepath, e.g., tpi_god_the_father_terms.html.x1y2z3.partial,
+    so that the progress of a long running task can be inspected while
+    the previous HTML, if any, continues to be served. Each writer's
+    .partial file is its own so that writers of the same table that
+    overlap never replace html_filepath with each other's incomplete
+    table.
+    """
+
+    def __init__(
+        self,
+        html_filepath: str,
+        rows: Sequence[Row],
+        header: str,
+        column_labels: str,
+    ) -> None:
+        self._html_filepath = html_filepath
+        self._rows = rows
+        self._before, self._after = enclosing_html(header)
+        self._column_labels = column_labels
+        self._next_row = 0
+        # Seconds spent writing as opposed to waiting on backtranslations.
+        self._writing = 0.0
+
+    def __enter__(self) -> "TableWriter":
+        fd, self._partial_filepath = tempfile.mkstemp(
+            dir=os.path.dirname(self._html_filepath) or None,
+            prefix=f"{os.path.basename(self._html_filepath)}.",
+            suffix=".partial",
+        )
+        # mkstemp creates files only the owner can read.
+        os.chmod(self._partial_filepath, 0o644)
+        self._file = os.fdopen(fd, "w", encoding="utf-8")
+        self._file.write(f"{self._before}<table>\n{self._column_labels}")
+        return self
+
+    def write_ready(
+        self, backtranslations: Mapping[tuple[str, str], Optional[str]]
+    ) -> None:
+        """
+        Write the rows, from the first one not yet written, whose
+        backtranslation, keyed by (verse_reference, hl_verse), is in
+        backtranslations.
+        """
+        start = time.perf_counter()
+        written = self._next_row
+        while self._next_row < len(self._rows):
+            verse_reference, gl_verse, hl_verse = self._rows[self._next_row]
+            if (verse_reference, hl_verse) not in backtranslations:
+                break
+            self._file.write(
+                table_row(
+                    verse_reference,
+                    gl_verse,
+                    hl_verse,
+                    backtranslations[(verse_reference, hl_verse)],
+                )
+            )
+            self._next_row += 1
+        if self._next_row > written:
+            self._file.flush()
+        self._writing += time.perf_counter() - start
+
+    def __exit__(
+        self,
+        exc_type: Optional[type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        complete = exc_type is None and self._next_row == len(self._rows)
+        if complete:
+            self._file.write(f"</table>{self._after}")
+        self._file.close()
+        if not complete:
+            os.remove(self._partial_filepath)
+            if exc_type is None:
+                raise RuntimeError(
+                    f"{self._html_filepath} is missing rows from {self._rows[self._next_row][0]} on"
+                )
+            return
+        os.replace(self._partial_filepath, self._html_filepath)
+        metrics.STAGE_SECONDS.labels("html_writing").observe(self._writing)
+        logger.debug("Wrote %s rows to %s", len(self._rows), self._html_filepath)
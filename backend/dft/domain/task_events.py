@@ -0,0 +1,147 @@
+"""
+This module provides push-based task status. Workers publish each
+change of a task's state, i.e., its progress reports and its success
+or failure, to a Redis pub/sub channel of the task's own. Each API
+process subscribes once, to the channels of all tasks, and fans the
+events it receives out to the clients streaming the status of the
+task concerned, so that those clients need not poll the result
+backend.
+"""
+
+import asyncio
+import json
+from typing import Any, Optional
+
+import redis
+import redis.asyncio
+from celery.signals import task_failure, task_retry, task_success
+from dft.config import dft_settings
+from dft.domain.redis_client import redis_client
+from document.config import settings
+
+logger = settings.logger(__name__)
+
+CHANNEL_PREFIX = "dft:task_events:"
+
+
+def publish_task_event(task_id: str, event: dict[str, Any]) -> None:
+    """
+    Publish event, shaped like the response of /task_status, as the
+    latest status of task_id. Status is also kept in the result
+    backend so a lost event only delays a client, hence Redis being
+    unavailable is logged rather than raised.
+    """
+    try:
+        redis_client().publish(f"{CHANNEL_PREFIX}{task_id}", json.dumps(event))
+    except redis.RedisError:
+        logger.exception("Could not publish event of task %s", task_id)
+
+
+@task_success.connect
+def publish_success(sender: Any = None, result: Any = None, **kwargs: Any) -> None:
+    if sender is not None and sender.request.id is not None:
+        publish_task_event(sender.request.id, {"state": "SUCCESS", "result": result})
+
+
+@task_failure.connect
+def publish_failure(task_id: Optional[str] = None, **kwargs: Any) -> None:
+    if task_id is not None:
+        publish_task_event(task_id, {"state": "FAILURE"})
+
+
+@task_retry.connect
+def publish_retry(request: Any = None, **kwargs: Any) -> None:
+    if request is not None and request.id is not None:
+        publish_task_event(request.id, {"state": "RETRY"})
+
+
+class TaskEventHub:
+    """
+    A single subscription, per API process, to the events of all tasks
+    which is started on first use and shared by every client waiting
+    on a task. Each client gets its task's events on a queue of its
+    own.
+    """
+
+    def __init__(self, redis_url: str = dft_settings.REDIS_URL) -> None:
+        self._redis_url = redis_url
+        self._queues: dict[str, set[asyncio.Queue[dict[str, Any]]]] = {}
+        self._lock = asyncio.Lock()
+        self._client: Optional[redis.asyncio.Redis] = None
+        self._pubsub: Optional[redis.asyncio.client.PubSub] = None
+        self._reader: Optional[asyncio.Task[None]] = None
+
+    async def _start(self) -> None:
+        async with self._lock:
+            if self._reader is not None and not self._reader.done():
+                return
+            # The previous subscription, if any, was lost.
+            await self._close_connections()
+            client: redis.asyncio.Redis = redis.asyncio.Redis.from_url(self._redis_url)
+            self._client = client
+            self._pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await self._pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+            except BaseException:
+                await self._close_connections()
+                raise
+            self._reader = asyncio.create_task(self._read(self._pubsub))
+
+    async def _read(self, pubsub: redis.asyncio.client.PubSub) -> None:
+        try:
+            async for message in pubsub.listen():
+                if message["type"] != "pmessage":
+                    continue
+                channel = message["channel"]
+                if isinstance(channel, bytes):
+                    channel = channel.decode("utf-8")
+                task_id = channel.removeprefix(CHANNEL_PREFIX)
+                try:
+                    event = json.loads(message["data"])
+                except ValueError:
+                    logger.warning("Dropped malformed event of task %s", task_id)
+                    continue
+                for queue in self._queues.get(task_id, ()):
+                    queue.put_nowait(event)
+        except redis.RedisError:
+            # Subscribers fall back to reading the result backend until
+            # the next subscribe restarts the subscription.
+            logger.exception("Lost the subscription to task events")
+
+    async def subscribe(self, task_id: str) -> asyncio.Queue[dict[str, Any]]:
+        """
+        Return a queue on which the events of task_id arrive until it
+        is unsubscribed. Raises redis.RedisError if Redis is
+        unavailable.
+        """
+        await self._start()
+        queue: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        self._queues.setdefault(task_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue[dict[str, Any]]) -> None:
+        """Stop the events of task_id arriving on queue."""
+        queues = self._queues.get(task_id, set())
+        queues.discard(queue)
+        if not queues:
+            self._queues.pop(task_id, None)
+
+    async def close(self) -> None:
+        """Stop the subscription."""
+        async with self._lock:
+            if self._reader is not None:
+                self._reader.cancel()
+                try:
+                    await self._reader
+                except (asyncio.CancelledError, redis.RedisError):
+                    pass
+                self._reader = None
+            await self._close_connections()
+
+    async def _close_connections(self) -> None:
+        if self._pubsub is not None:
+            await self._pubsub.aclose()  # type: ignore[no-untyped-call]
+            self._pubsub = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
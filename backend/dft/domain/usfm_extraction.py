@@ -0,0 +1,267 @@
+"""
+This module provides extraction of just the verses needed by the terms
+tables from a USFM source file. Rather than converting a whole book to
+HTML and reifying every chapter and verse as
+document.domain.parsing.usfm_book_content does, the USFM is scanned for
+the chapter and verse markers of interest and everything else is
+skipped.
+"""
+
+import html
+import re
+from glob import glob
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Mapping, Optional
+
+from dft.domain.model import HtmlContent, TermsBook, TermsChapter
+from document.config import settings
+from document.domain.bible_books import BOOK_NAMES
+from document.domain import parsing
+from document.domain.model import USFMBook
+
+if TYPE_CHECKING:
+    from document.domain.model import ResourceLookupDto
+
+logger = settings.logger(__name__)
+
+CHAPTER_MARKER = re.compile(r"\\c\s+(\d+)")
+VERSE_MARKER = re.compile(r"\\v\s+(\d+)(?:-(\d+))?\s*")
+ID_MARKER = re.compile(r"\\id\s+(\w+)")
+# Footnotes, cross references and their endnote variants, none of which
+# are verse text.
+NOTES = re.compile(r"\\(f|fe|x|ef|ex)\s.*?\\\1\*", re.DOTALL)
+# Character markers whose content isn't verse text either: figures,
+# alternate and published verse and chapter numbers, and inline
+# quotation references.
+NON_TEXT = re.compile(r"\\(fig|va|vp|ca|rq|cat)\s.*?\\\1\*", re.DOTALL)
+# Milestones, e.g., the ULT's alignment \zaln-s |x-strong="G0976" ...\*
+# and \zaln-e\*.
+MILESTONES = re.compile(r"\\[a-z]+\d*-[se]\b[^\\]*(?:\\\*)?")
+# Section headings and the like that live on their own line in the
+# verse's span of USFM.
+HEADINGS = re.compile(r"\\(?:s\d?|ms\d?|mr|r|d|sp|cl)\b[^\n\\]*")
+# \w word|lemma="..." strong="..."\w* -> word
+WORD_ATTRIBUTES = re.compile(r"\|[^\\]*?(?=\\\+?\w+\*)")
+# Closing markers, e.g., \w*, unlike opening ones, aren't followed by
+# whitespace, so they're removed without leaving any.
+END_MARKERS = re.compile(r"\\\+?[a-z]+\d*\*")
+MARKERS = re.compile(r"\\\+?[a-z]+\d*")
+WHITESPACE = re.compile(r"\s+")
+
+
+def needed_chapters(
+    terms_tables: Iterable[dict[str, dict[int, list[int]]]],
+    book_code: str,
+) -> dict[int, set[int]]:
+    """
+    Return the union, per chapter, of the verse numbers of book_code
+    across terms_tables.
+
+    >>> needed_chapters([{"mat": {1: [1, 2]}}, {"mat": {1: [2, 3], 2: [1]}}], "mat")
+    {1: {1, 2, 3}, 2: {1}}
+    """
+    chapters: dict[int, set[int]] = {}
+    for terms in terms_tables:
+        for chapter_num, verse_nums in terms.get(book_code, {}).items():
+            chapters.setdefault(chapter_num, set()).update(verse_nums)
+    return chapters
+
+
+def usfm_file(resource_dir: str, book_code: str) -> Optional[str]:
+    """
+    Return the path of the USFM file for book_code in resource_dir, if
+    there is one, preferring files whose name mentions book_code and
+    confirming the book via its \\id marker.
+    """
+    candidates = [
+        path
+        for path in glob(f"{resource_dir}/**/*", recursive=True)
+        if Path(path).suffix.lower() in (".usfm", ".sfm")
+    ]
+    candidates.sort(key=lambda path: book_code not in Path(path).stem.lower())
+    for path in candidates:
+        with open(path, encoding="utf-8", errors="replace") as fin:
+            id_marker = ID_MARKER.search(fin.read(1024))
+        if id_marker and id_marker.group(1).lower() == book_code:
+            return path
+    return None
+
+
+def verse_text(verse_usfm: str) -> str:
+    """
+    Return the plain text of verse_usfm without its notes, headings,
+    figures, alternate verse numbers, milestones and markers.
+
+    >>> verse_text("\\\\w In|strong=\\"G1722\\"\\\\w* the \\\\f + \\\\ft note\\\\f* beginning \\\\q1 was\\n\\\\s5\\n")
+    'In the beginning was'
+    >>> verse_text("\\\\va 2\\\\va* \\\\zaln-s |x-strong=\\"G0976\\"\\\\*\\\\w Book|x-occurrence=\\"1\\"\\\\w*\\\\zaln-e\\\\* \\\\fig Scroll|src=\\"s.jpg\\" ref=\\"1.1\\"\\\\fig*of life")
+    'Book of life'
+    """
+    text = NOTES.sub("", verse_usfm)
+    text = NON_TEXT.sub("", text)
+    text = MILESTONES.sub("", text)
+    text = HEADINGS.sub(" ", text)
+    text = WORD_ATTRIBUTES.sub("", text)
+    text = END_MARKERS.sub("", text)
+    text = MARKERS.sub(" ", text)
+    return WHITESPACE.sub(" ", text).strip()
+
+
+def verse_html(
+    lang_code: str,
+    book_code: str,
+    chapter_num: int,
+    verse_label: str,
+    text: str,
+    book_names: Mapping[str, str] = BOOK_NAMES,
+) -> HtmlContent:
+    """
+    Return the verse's HTML in the same shape as the verses of a
+    USFMBook.
+
+    >>> verse_html("en", "gen", 1, "1", "In the beginning")
+    '<span class="v-num" id=\\'en-001-ch-001-v-001\\'><sup><b>1</b></sup></span> In the beginning'
+    """
+    book_num = list(book_names).index(book_code) + 1
+    verse_id = f"{lang_code}-{book_num:03}-ch-{chapter_num:03}-v-{int(verse_label.split('-')[0]):03}"
+    return f"<span class=\"v-num\" id='{verse_id}'><sup><b>{verse_label}</b></sup></span> {html.escape(text, quote=False)}"
+
+
+def extract_verses(
+    usfm: str,
+    chapters: Mapping[int, set[int]],
+) -> dict[int, dict[str, tuple[str, str]]]:
+    """
+    Return the (verse label, text) of each verse in chapters found in
+    usfm, keyed by chapter number and then verse number. Chapters not
+    in chapters are skipped without being scanned for verses. A verse
+    bridge, e.g., \\v 16-17, is returned under each verse number it
+    covers with a verse label of 16-17.
+    """
+    extracted: dict[int, dict[str, tuple[str, str]]] = {}
+    chapter_markers = list(CHAPTER_MARKER.finditer(usfm))
+    for index, chapter_marker in enumerate(chapter_markers):
+        chapter_num = int(chapter_marker.group(1))
+        verse_nums = chapters.get(chapter_num)
+        if not verse_nums:
+            continue
+        chapter_end = (
+            chapter_markers[index + 1].start()
+            if index + 1 < len(chapter_markers)
+            else len(usfm)
+        )
+        chapter_usfm = usfm[chapter_marker.end() : chapter_end]
+        verse_markers = list(VERSE_MARKER.finditer(chapter_usfm))
+        for verse_index, verse_marker in enumerate(verse_markers):
+            first = int(verse_marker.group(1))
+            last = int(verse_marker.group(2) or first)
+            wanted = [num for num in range(first, last + 1) if num in verse_nums]
+            if not wanted:
+                continue
+            verse_end = (
+                verse_markers[verse_index + 1].start()
+                if verse_index + 1 < len(verse_markers)
+                else len(chapter_usfm)
+            )
+            verse_label = f"{first}-{last}" if last != first else str(first)
+            text = verse_text(chapter_usfm[verse_marker.end() : verse_end])
+            for num in wanted:
+                extracted.setdefault(chapter_num, {})[str(num)] = (verse_label, text)
+    return extracted
+
+
+def terms_book(
+    lang_code: str,
+    resource_type: str,
+    book_code: str,
+    resource_dir: str,
+    chapters: Mapping[int, set[int]],
+) -> Optional[TermsBook]:
+    """
+    Return a TermsBook holding only the verses in chapters, extracted
+    straight from the book's USFM file in resource_dir, or None if no
+    USFM file could be found there for the book.
+    """
+    path = usfm_file(resource_dir, book_code)
+    if path is None:
+        return None
+    with open(path, encoding="utf-8", errors="replace") as fin:
+        extracted = extract_verses(fin.read(), chapters)
+    return TermsBook(
+        lang_code=lang_code,
+        resource_type=resource_type,
+        book_code=book_code,
+        chapters={
+            chapter_num: TermsChapter(
+                verses={
+                    verse_num: verse_html(
+                        lang_code, book_code, chapter_num, verse_label, text
+                    )
+                    for verse_num, (verse_label, text) in verses.items()
+                }
+            )
+            for chapter_num, verses in extracted.items()
+        },
+    )
+
+
+def terms_book_from_usfm_book(
+    usfm_book: USFMBook,
+    lang_code: str,
+    resource_type: str,
+    chapters: Mapping[int, set[int]],
+) -> TermsBook:
+    """
+    Return a TermsBook holding only the verses in chapters of an
+    already parsed usfm_book so that the rest of the book can be freed.
+    """
+    return TermsBook(
+        lang_code=lang_code,
+        resource_type=resource_type,
+        book_code=usfm_book.book_code,
+        chapters={
+            chapter_num: TermsChapter(
+                verses={
+                    verse_num: verse
+                    for verse_num, verse in usfm_book.chapters[
+                        chapter_num
+                    ].verses.items()
+                    if verse_num in {str(num) for num in verse_nums}
+                }
+            )
+            for chapter_num, verse_nums in chapters.items()
+            if chapter_num in usfm_book.chapters
+        },
+    )
+
+
+def usfm_terms_book(
+    resource_lookup_dto: "ResourceLookupDto",
+    resource_dir: str,
+    lang_code: str,
+    resource_type: str,
+    book_code: str,
+    chapters: Mapping[int, set[int]],
+    use_targeted_usfm_extraction: bool,
+) -> TermsBook:
+    """
+    Return the TermsBook for the already provisioned resource_dir,
+    preferring targeted extraction and falling back to fully parsing
+    the book. This is a module level function so that it can be run in
+    a process pool.
+    """
+    usfm_book = None
+    if use_targeted_usfm_extraction:
+        # Pull just the verses the terms tables need
+        usfm_book = terms_book(
+            lang_code, resource_type, book_code, resource_dir, chapters
+        )
+    if usfm_book is None:
+        # Reify the content
+        usfm_book = terms_book_from_usfm_book(
+            parsing.usfm_book_content(resource_lookup_dto, resource_dir, [], False),
+            lang_code,
+            resource_type,
+            chapters,
+        )
+    return usfm_book
@@ -0,0 +1,153 @@
+"""
+This module provides fast extraction of the text of a verse's HTML,
+e.g., '<span class="v-num" ...><sup><b>16</b></sup></span> Wun bene
+...', as sent to the AI and used to key backtranslations. The text is
+exactly what BeautifulSoup(html, "lxml").get_text() returns, so prompts
+and cache keys are unchanged, but it is found in one pass over the HTML
+rather than by building a parse tree per verse.
+
+Only the markup verses are made of is handled this way: inline tags
+such as the verse number's span, sup and b, and the common character
+references. Anything else, where lxml's handling of malformed or
+unusual HTML would have to be reproduced, falls back to BeautifulSoup.
+"""
+
+import re
+from typing import Iterable, Match
+
+from bs4 import BeautifulSoup
+
+# Tags whose only effect on the text is to be removed.
+INLINE_TAGS = frozenset(
+    [
+        "a",
+        "b",
+        "br",
+        "em",
+        "font",
+        "i",
+        "q",
+        "s",
+        "small",
+        "span",
+        "strong",
+        "sub",
+        "sup",
+        "u",
+    ]
+)
+
+NAMED_REFERENCES = {
+    "amp": "&",
+    "lt": "<",
+    "gt": ">",
+    "quot": '"',
+    "apos": "'",
+    "nbsp": "\xa0",
+}
+
+TAG = re.compile(
+    r"""<
+    (?P<end>/?)(?P<name>[A-Za-z][A-Za-z0-9]*)
+    (?:\s+[A-Za-z_:][-\w:.]*(?:\s*=\s*(?:"[^"]*"|'[^']*'|[^\s"'=<>`]+))?)*
+    \s*/?>""",
+    re.VERBOSE,
+)
+REFERENCE = re.compile(
+    r"&(?:\#(?P<decimal>[0-9]{1,7});|\#[xX](?P<hex>[0-9a-fA-F]{1,6});|(?P<named>[a-z]+);)"
+)
+# Text that lxml might treat specially: stray markup, references other
+# than those above, and control characters.
+UNHANDLED_TEXT = re.compile(
+    r"<|&(?!\#[0-9]{1,7};|\#[xX][0-9a-fA-F]{1,6};|[a-z]+;)|[\r\x00-\x08\x0b\x0c\x0e-\x1f]"
+)
+# lxml drops whitespace at the start of the document and may drop or
+# collapse text that is nothing but whitespace.
+BLANKS = " \t\n"
+
+
+class _Unhandled(Exception):
+    pass
+
+
+def _reference(match: Match[str]) -> str:
+    if match["named"]:
+        if match["named"] not in NAMED_REFERENCES:
+            raise _Unhandled
+        return NAMED_REFERENCES[match["named"]]
+    code_point = int(match["decimal"]) if match["decimal"] else int(match["hex"], 16)
+    # Leave whitespace, control characters, surrogates and out of range
+    # code points to lxml.
+    if (
+        code_point <= 0x20
+        or code_point == 0x7F
+        or 0xD800 <= code_point <= 0xDFFF
+        or code_point > 0x10FFFF
+    ):
+        raise _Unhandled
+    return chr(code_point)
+
+
+def _text(text: str) -> str:
+    if UNHANDLED_TEXT.search(text) or (text and not text.strip(BLANKS)):
+        raise _Unhandled
+    return REFERENCE.sub(_reference, text) if "&" in text else text
+
+
+def _verse_text(html: str) -> str:
+    """
+    Return the text of html, raising _Unhandled if it isn't made of
+    inline tags and text only.
+    """
+    html = html.lstrip(BLANKS)
+    parts: list[str] = []
+    position = 0
+    for match in TAG.finditer(html):
+        if match["name"].lower() not in INLINE_TAGS:
+            raise _Unhandled
+        # lxml drops what follows an end tag that opens the document.
+        if match["end"] and not parts and not match.start():
+            raise _Unhandled
+        parts.append(_text(html[position : match.start()]))
+        position = match.end()
+    parts.append(_text(html[position:]))
+    return "".join(parts)
+
+
+def soup_text(html: str) -> str:
+    """Return the text of html as found by BeautifulSoup."""
+    return BeautifulSoup(html, "lxml").get_text()
+
+
+def verse_text(html: str) -> str:
+    """
+    Return the text of the verse's html, i.e., with its tags, including
+    those of its verse number, removed and its character references
+    resolved.
+
+    >>> verse_text('<span class="v-num" id=\\'en-001-ch-001-v-001\\'><sup><b>1</b></sup></span> In the beginning')
+    '1 In the beginning'
+    >>> verse_text("<span class=\\"v-num\\"><sup><b>2</b></sup></span> Bread &amp; wine&nbsp;&#8212; ")
+    '2 Bread & wine\\xa0— '
+    >>> verse_text("  <p>Unusual markup</p>") == soup_text("  <p>Unusual markup</p>")
+    True
+    """
+    try:
+        return _verse_text(html)
+    except _Unhandled:
+        return soup_text(html)
+
+
+def verse_texts(htmls: Iterable[str]) -> list[str]:
+    """
+    Return the text of each verse's HTML in htmls, e.g., of every row
+    of a table, extracting the text of a verse repeated in htmls once.
+
+    >>> verse_texts(["<b>1</b> a", "<b>1</b> a", ""])
+    ['1 a', '1 a', '']
+    """
+    texts: dict[str, str] = {}
+    return [
+        texts[html] if html in texts else texts.setdefault(html, verse_text(html))
+        for html in htmls
+    ]
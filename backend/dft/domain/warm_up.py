@@ -0,0 +1,163 @@
+"""
+This module provides the periodic pre-generation of stale terms tables
+for popular languages, e.g., during off-peak hours, so that
+interactive requests for them take the API's fast path. It runs as a
+celery beat scheduled task (see celeryconfig.beat_schedule) or from
+the command line:
+
+    python -m dft.domain.warm_up [--max-workers N] [--time-budget SECONDS] [LANG_CODE ...]
+"""
+
+import argparse
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Optional, Sequence
+
+import redis
+from dft.config import dft_settings
+from dft.domain import dft_checker
+from dft.domain.documents import (
+    fresh_terms_documents,
+    popular_lang_codes,
+    table_lock_keys,
+)
+from dft.domain.model import DocumentRequest, DocumentRequestTermsEnum
+from dft.domain.progress import ProgressReporter
+from dft.domain.single_flight import non_coalescable_id, single_flight
+from document.config import settings
+from document.domain import worker
+from toolz import unique  # type: ignore
+
+logger = settings.logger(__name__)
+
+
+def warm_up_lang_codes(
+    configured_lang_codes: Sequence[str] = dft_settings.WARM_UP_LANG_CODES,
+    popular_languages: int = dft_settings.WARM_UP_POPULAR_LANGUAGES,
+) -> list[str]:
+    """
+    Return the configured languages followed by the most requested
+    ones.
+    """
+    return list(
+        unique([*configured_lang_codes, *popular_lang_codes(popular_languages)])
+    )
+
+
+def warm_up_language(lang_code: str) -> str:
+    """
+    Regenerate every terms table and document type of lang_code that
+    is stale and return the outcome: regenerated, fresh, or, if a
+    request or batch is already writing any of lang_code's tables, in
+    flight, in which case it is left to do so.
+    """
+    document_request = DocumentRequest(
+        lang_code=lang_code,
+        terms=DocumentRequestTermsEnum.ALL,
+        generate_pdf=True,
+        generate_docx=True,
+    )
+    if fresh_terms_documents(document_request) is not None:
+        return "fresh"
+    keys = table_lock_keys(document_request)
+    task_id = non_coalescable_id("warm-up")
+    try:
+        holder = single_flight().claim_all(keys, task_id)
+    except redis.RedisError:
+        logger.exception("Could not claim %s, warming it up anyway", keys)
+        holder = None
+    if holder is not None:
+        logger.debug("Leaving %s to %s", lang_code, holder)
+        return "in flight"
+    with single_flight().held_all(keys, task_id):
+        dft_checker.terms_documents_for_request(
+            document_request, ProgressReporter(None)
+        )
+    return "regenerated"
+
+
+def warm_up_languages(
+    lang_codes: Sequence[str],
+    max_workers: int = dft_settings.WARM_UP_MAX_WORKERS,
+    time_budget: float = dft_settings.WARM_UP_TIME_BUDGET,
+) -> dict[str, str]:
+    """
+    Warm up lang_codes, in order, at most max_workers at a time. No
+    language is started once time_budget seconds have passed; those
+    already started are finished. Return the outcome of each language:
+    regenerated, fresh, in flight, failed, or skipped.
+    """
+    deadline = time.monotonic() + time_budget
+    outcomes = {lang_code: "skipped" for lang_code in lang_codes}
+    pending: dict[Future[str], str] = {}
+    remaining = list(lang_codes)
+    with ThreadPoolExecutor(
+        max_workers=max(1, max_workers), thread_name_prefix="warm-up"
+    ) as executor:
+        while remaining or pending:
+            while (
+                remaining
+                and len(pending) < max(1, max_workers)
+                and time.monotonic() < deadline
+            ):
+                lang_code = remaining.pop(0)
+                pending[executor.submit(warm_up_language, lang_code)] = lang_code
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                lang_code = pending.pop(future)
+                try:
+                    outcomes[lang_code] = future.result()
+                except Exception:
+                    logger.exception("Warming up %s failed", lang_code)
+                    outcomes[lang_code] = "failed"
+    logger.info("Warm up outcomes: %s", outcomes)
+    return outcomes
+
+
+@worker.app.task
+def warm_up(
+    lang_codes: Optional[list[str]] = None,
+    max_workers: int = dft_settings.WARM_UP_MAX_WORKERS,
+    time_budget: float = dft_settings.WARM_UP_TIME_BUDGET,
+) -> Any:
+    """
+    Warm up lang_codes, or, by default, the configured and most
+    requested languages.
+    """
+    return warm_up_languages(
+        lang_codes if lang_codes is not None else warm_up_lang_codes(),
+        max_workers,
+        time_budget,
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Regenerate stale terms tables of popular languages."
+    )
+    parser.add_argument(
+        "lang_codes",
+        nargs="*",
+        help="languages to warm up, by default the configured and most requested ones",
+    )
+    parser.add_argument(
+        "--max-workers", type=int, default=dft_settings.WARM_UP_MAX_WORKERS
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        default=dft_settings.WARM_UP_TIME_BUDGET,
+        help="seconds after which no more languages are started",
+    )
+    args = parser.parse_args(argv)
+    outcomes = warm_up_languages(
+        args.lang_codes or warm_up_lang_codes(), args.max_workers, args.time_budget
+    )
+    for lang_code, outcome in outcomes.items():
+        print(f"{lang_code}: {outcome}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,51 @@
 """This module provides the FastAPI API definition."""
 
+import asyncio
+import json
 import os
 import pathlib
-from typing import Any, Iterable, Sequence
+import time
+from contextlib import asynccontextmanager, suppress
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Iterable, Sequence
 
 import celery.states
+import redis
 from celery.result import AsyncResult
+from celery.utils import uuid
 from document.config import settings
 from fastapi import FastAPI, HTTPException, Query, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 from pydantic import AnyHttpUrl
 
-from dft.domain import dft_checker, model
+from dft.config import dft_settings
+from dft.domain import data_api, documents, metrics, model, worker
+from dft.domain.single_flight import single_flight
+from dft.domain.snapshot_cache import SnapshotCache, not_modified
+from dft.domain.task_events import TaskEventHub
+
+languages_cache = SnapshotCache(
+    documents.lang_codes_and_names,
+    dft_settings.LANGUAGES_CACHE_TTL,
+    dft_settings.LANGUAGES_SNAPSHOT_PATH,
+)
+task_event_hub = TaskEventHub()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Warm the languages cache without holding up startup.
+    languages_cache.refresh()
+    yield
+    # Release the data API's pooled connections.
+    await data_api.close_async()
+    await task_event_hub.close()
 
-app = FastAPI()
+
+app = FastAPI(lifespan=lifespan)
 
 
 logger = settings.logger(__name__)
@@ -34,12 +64,100 @@ app.add_middleware(
 )
 
 
-@app.get("/language_codes_and_names")
-async def lang_codes_and_names() -> Sequence[tuple[str, str, bool]]:
+@app.middleware("http")
+async def record_metrics(
+    request: Request, call_next: Callable[[Request], Awaitable[Response]]
+) -> Response:
+    """Record the latency of each request by route."""
+    metrics.HTTP_REQUESTS_IN_PROGRESS.labels(request.method).inc()
+    start = time.perf_counter()
+    status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # Label by route template rather than path to bound the number
+        # of series, e.g., /task_status/{task_id}.
+        route = request.scope.get("route")
+        metrics.HTTP_REQUEST_SECONDS.labels(
+            request.method, getattr(route, "path", "unmatched"), str(status_code)
+        ).observe(time.perf_counter() - start)
+        metrics.HTTP_REQUESTS_IN_PROGRESS.labels(request.method).dec()
+
+
+@app.get("/language_codes_and_names", response_model=Sequence[tuple[str, str, bool]])
+async def lang_codes_and_names(request: Request) -> Response:
     """
     Return list of all available language code, name tuples.
+
+    The list is served from a cache that is refreshed in the background
+    and supports conditional GETs via ETag and Last-Modified.
     """
-    return await dft_checker.lang_codes_and_names()  # When using data API
+    snapshot = await languages_cache.get()
+    if snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Language list is temporarily unavailable",
+        )
+    headers = {
+        "ETag": snapshot.etag,
+        "Last-Modified": formatdate(snapshot.last_modified, usegmt=True),
+        # Let browsers keep the list but revalidate it on each use.
+        "Cache-Control": "no-cache",
+    }
+    if_modified_since = None
+    if "if-modified-since" in request.headers:
+        try:
+            if_modified_since = parsedate_to_datetime(
+                request.headers["if-modified-since"]
+            ).timestamp()
+        except (TypeError, ValueError):
+            pass
+    if not_modified(snapshot, request.headers.get("if-none-match"), if_modified_since):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=snapshot.body, media_type="application/json", headers=headers
+    )
+
+
+def enqueue_document_request(
+    document_request: model.DocumentRequest,
+    queued_claim_ttl: int = dft_settings.DOCUMENT_REQUEST_QUEUED_CLAIM_TTL,
+) -> str:
+    """
+    Enqueue generation of document_request and return the task's id
+    or, if an identical request is already in flight, return that
+    request's task id instead. The claim lasts queued_claim_ttl seconds
+    so that it outlives the task's wait in the queue; the task renews
+    it at the shorter DOCUMENT_REQUEST_CLAIM_TTL once it starts.
+    """
+    key = documents.single_flight_key(document_request)
+    task_id = uuid()
+    try:
+        holder = single_flight().claim(key, task_id, queued_claim_ttl)
+        if holder is not None and AsyncResult(holder, app=worker.app).ready():
+            # The holder finished without releasing its claim.
+            single_flight().release(key, holder)
+            holder = single_flight().claim(key, task_id, queued_claim_ttl)
+    except redis.RedisError:
+        logger.exception("Could not coalesce document request, enqueueing it anyway")
+        holder = None
+    if holder is not None:
+        logger.debug("Coalescing %s with in flight task %s", key, holder)
+        return holder
+    try:
+        # Enqueued by name so that the API needn't import the worker's code.
+        worker.app.send_task(
+            documents.GENERATE_DOCUMENT_TASK,
+            args=(document_request.json(),),
+            task_id=task_id,
+        )
+    except:
+        with suppress(redis.RedisError):
+            single_flight().release(key, task_id)
+        raise
+    return task_id
 
 
 @app.post("/documents")
@@ -47,13 +165,22 @@ async def generate_document(
     document_request: model.DocumentRequest,
 ) -> JSONResponse:
     """
-    Return file paths to PDF and Docx for God the Father terms table
-    and Son of God terms table.
+    Enqueue generation of the requested terms tables. The HTML and
+    whichever of PDF and Docx are flagged in document_request are
+    produced by a single task whose result lists, per table, the
+    document request key and the file names of its documents.
+
+    If every requested document is already fresh no task is enqueued
+    and, rather than a task_id, the response is what /task_status
+    would return for a task that had produced them, i.e., a SUCCESS
+    state and result.
     """
+    documents.record_usage(document_request.lang_code)
     try:
-        task = dft_checker.generate_document.apply_async(
-            args=(document_request.json(),)
-        )
+        terms_documents = documents.fresh_terms_documents(document_request)
+        metrics.cache_lookup("documents", terms_documents is not None)
+        if terms_documents is None:
+            task_id = enqueue_document_request(document_request)
     except HTTPException as exc:
         raise exc
     except Exception as exc:  # catch any exceptions we weren't expecting, handlers handle the ones we do expect.
@@ -66,27 +193,55 @@ async def generate_document(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(exc)
         )
     else:
-        logger.debug("task_id: %s", task.id)
-        return JSONResponse({"task_id": task.id})
+        if terms_documents is not None:
+            logger.debug("Documents are fresh: %s", terms_documents)
+            return JSONResponse(
+                {
+                    "state": celery.states.SUCCESS,
+                    "result": [document.model_dump() for document in terms_documents],
+                }
+            )
+        logger.debug("task_id: %s", task_id)
+        return JSONResponse({"task_id": task_id})
 
 
-@app.post("/documents_docx")
+@app.post("/documents_docx", deprecated=True)
 async def generate_docx_document(
     document_request: model.DocumentRequest,
 ) -> JSONResponse:
     """
-    Return file paths to PDF and Docx for God the Father terms table
-    and Son of God terms table.
+    Same as /documents but produces Docx, and, as it always has, no
+    PDF. Kept for older clients; use /documents with generate_docx
+    instead.
+    """
+    return await generate_document(
+        document_request.model_copy(
+            update={"generate_docx": True, "generate_pdf": False}
+        )
+    )
+
+
+@app.post("/documents/batch")
+async def generate_batch(
+    batch_request: model.BatchDocumentRequest,
+) -> JSONResponse:
+    """
+    Enqueue generation of the requested terms tables for each of many
+    languages. Languages sharing a gateway language are generated
+    together, in parallel, so that the gateway language's resources
+    are only loaded once per group, and the groups themselves run in
+    parallel. The returned task_id tracks the whole batch: once it
+    succeeds, its result lists a model.BatchMemberResult per language.
     """
     try:
-        task = dft_checker.generate_docx_document.apply_async(
-            args=(document_request.json(),)
+        task = worker.app.send_task(
+            documents.GENERATE_BATCH_TASK, args=(batch_request.json(),)
         )
     except HTTPException as exc:
         raise exc
     except Exception as exc:  # catch any exceptions we weren't expecting, handlers handle the ones we do expect.
         logger.exception(
-            "There was an error while attempting to fulfill the document "
+            "There was an error while attempting to fulfill the batch "
             "request. Likely reason is the following exception:"
         )
         # Handle exceptions that aren't handled otherwise
@@ -98,15 +253,70 @@ async def generate_docx_document(
         return JSONResponse({"task_id": task.id})
 
 
+def task_status_body(task_id: str) -> dict[str, Any]:
+    """
+    Return the task's state along with, once it has succeeded, its
+    result or, while it is running, its progress (see
+    model.TaskProgress) if it has reported any.
+    """
+    res: AsyncResult[dict[str, str]] = AsyncResult(task_id, app=worker.app)
+    if res.state == celery.states.SUCCESS:
+        return {"state": celery.states.SUCCESS, "result": res.result}
+    if res.state not in celery.states.READY_STATES and isinstance(res.info, dict):
+        return {"state": res.state, "progress": res.info}
+    return {"state": res.state}
+
+
 @app.get("/task_status/{task_id}")
 async def task_status(task_id: str) -> JSONResponse:
-    res: AsyncResult[dict[str, str]] = AsyncResult(task_id)
-    if res.state == celery.states.SUCCESS:
-        return JSONResponse({"state": celery.states.SUCCESS, "result": res.result})
-    return JSONResponse(
-        {
-            "state": res.state,
-        }
+    """
+    Return the task's state along with, once it has succeeded, its
+    result or, while it is running, its progress (see
+    model.TaskProgress) if it has reported any.
+    """
+    return JSONResponse(task_status_body(task_id))
+
+
+@app.get("/task_status/{task_id}/events")
+async def task_status_events(task_id: str) -> StreamingResponse:
+    """
+    Stream the task's status, as returned by /task_status, as
+    Server-Sent Events: its current status first and then each change
+    as the worker publishes it, until the task is ready. Clients that
+    can't stream, or whose stream fails, poll /task_status instead.
+    """
+    try:
+        events = await task_event_hub.subscribe(task_id)
+    except redis.RedisError:
+        logger.exception("Could not subscribe to events of task %s", task_id)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Task status streaming is unavailable, poll /task_status instead",
+        )
+
+    async def stream() -> AsyncIterator[str]:
+        try:
+            # Subscribed before reading the current status so that no
+            # change in between is missed.
+            body = task_status_body(task_id)
+            while True:
+                yield f"data: {json.dumps(body)}\n\n"
+                if body["state"] in celery.states.READY_STATES:
+                    return
+                try:
+                    body = await asyncio.wait_for(
+                        events.get(), dft_settings.TASK_EVENTS_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    body = task_status_body(task_id)
+        finally:
+            task_event_hub.unsubscribe(task_id, events)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        # Keep proxies, e.g., nginx, from buffering the stream.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
@@ -116,6 +326,14 @@ async def health_status() -> tuple[dict[str, str], int]:
     return {"status": "ok"}, 200
 
 
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    """Return the API's metrics in Prometheus text format."""
+    return Response(
+        content=generate_latest(metrics.registry()), media_type=CONTENT_TYPE_LATEST
+    )
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(
     request: Request, exc: RequestValidationError
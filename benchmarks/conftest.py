@@ -0,0 +1,202 @@
+"""
+Benchmark fixtures. Every external service the terms tables depend on
+is replaced by a local stand-in before dft is imported: the data API
+by FakeDataApi, OpenAI by FakeChatCompletions, and the provisioning of
+translations by synthetic NT USFM written to a temporary directory.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator
+
+import pytest
+from fake_chat_completions import FakeChatCompletions
+from fake_data_api import FakeDataApi
+from usfm_fixtures import NT_BOOKS, write_new_testament
+
+HL_LANG_CODE = "bench-hl"
+GL_LANG_CODE = "bench-gl"
+LANGUAGE_NAMES = {HL_LANG_CODE: "Benchmark Heart", GL_LANG_CODE: "Benchmark Gateway"}
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    group = parser.getgroup("dft benchmarks")
+    group.addoption(
+        "--chat-latency",
+        type=float,
+        default=0.2,
+        help="seconds each fake chat completion takes",
+    )
+    group.addoption(
+        "--chat-latency-per-verse",
+        type=float,
+        default=0.01,
+        help="additional seconds a fake chat completion takes per verse",
+    )
+    group.addoption(
+        "--chat-rate-limit-every",
+        type=int,
+        default=0,
+        help="refuse every Nth chat completion with a 429, 0 never does",
+    )
+    group.addoption(
+        "--chat-retry-after",
+        type=float,
+        default=1.0,
+        help="Retry-After seconds sent with each 429",
+    )
+    group.addoption(
+        "--data-api-latency",
+        type=float,
+        default=0.05,
+        help="seconds each fake data API query takes",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    working_dir = Path(tempfile.mkdtemp(prefix="dft-benchmarks-"))
+    config.dft_working_dir = working_dir  # type: ignore[attr-defined]
+    config.dft_data_api = FakeDataApi(  # type: ignore[attr-defined]
+        LANGUAGE_NAMES,
+        {HL_LANG_CODE: GL_LANG_CODE},
+        config.getoption("--data-api-latency"),
+    ).start()
+    config.dft_chat_completions = FakeChatCompletions(  # type: ignore[attr-defined]
+        config.getoption("--chat-latency"),
+        config.getoption("--chat-latency-per-verse"),
+        config.getoption("--chat-rate-limit-every"),
+        config.getoption("--chat-retry-after"),
+    ).start()
+    # dft and DOC read their settings on import. DOC's output and
+    # working directories default to ones relative to the current
+    # directory, so they're moved into the working directory too.
+    for directory in ("document_output", "working/temp"):
+        (working_dir / directory).mkdir(parents=True)
+    os.environ.update(
+        DOCUMENT_OUTPUT_DIR=str(working_dir / "document_output"),
+        RESOURCE_ASSETS_DIR=str(working_dir / "working" / "temp"),
+        DATA_API_URL=config.dft_data_api.url,  # type: ignore[attr-defined]
+        DATA_API_SCHEMA_PATH=str(working_dir / "data_api_schema.graphql"),
+        OPENAI_BASE_URL=config.dft_chat_completions.url,  # type: ignore[attr-defined]
+        OPENAI_API_KEY="benchmark",
+        USE_AI="true",
+        BACKTRANSLATION_CACHE_BACKEND="memory",
+        # Without Redis calls to the AI aren't rate limited, only
+        # retried, and generation isn't checkpointed.
+        AI_REQUESTS_PER_MINUTE="0",
+        CHECKPOINT_TTL="0",
+    )
+
+
+def pytest_unconfigure(config: pytest.Config) -> None:
+    for attr in ("dft_data_api", "dft_chat_completions"):
+        if hasattr(config, attr):
+            getattr(config, attr).stop()
+    if hasattr(config, "dft_working_dir"):
+        shutil.rmtree(config.dft_working_dir, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def data_api(pytestconfig: pytest.Config) -> FakeDataApi:
+    return pytestconfig.dft_data_api  # type: ignore[attr-defined, no-any-return]
+
+
+@pytest.fixture(scope="session")
+def chat_completions(pytestconfig: pytest.Config) -> FakeChatCompletions:
+    return pytestconfig.dft_chat_completions  # type: ignore[attr-defined, no-any-return]
+
+
+@pytest.fixture(scope="session", autouse=True)
+def translations(pytestconfig: pytest.Config) -> Iterator[None]:
+    """
+    Provision books from a synthetic NT, per language, rather than from
+    translation repos.
+    """
+    from document.config import settings
+    from document.domain import resource_lookup
+
+    from dft.domain.god_the_father_terms import gtf_terms_table
+    from dft.domain.son_of_god_terms import sog_terms_table
+
+    resources_dir = pytestconfig.dft_working_dir / "resources"  # type: ignore[attr-defined]
+    for lang_code in LANGUAGE_NAMES:
+        write_new_testament(
+            resources_dir / lang_code, lang_code, [gtf_terms_table, sog_terms_table]
+        )
+    resource_type = next(
+        resource_type
+        for resource_type in settings.USFM_RESOURCE_TYPES
+        if resource_type in settings.ALL_USFM_RESOURCE_TYPES
+    )
+
+    def usfm_resource_lookup(
+        lang_code: str, resource_type: str, book_code: str, *args: Any
+    ) -> Any:
+        return SimpleNamespace(
+            lang_code=lang_code,
+            lang_name=LANGUAGE_NAMES[lang_code],
+            resource_type=resource_type,
+            resource_type_name=resource_type,
+            book_code=book_code,
+            url=str(resources_dir / lang_code),
+        )
+
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.setattr(
+            resource_lookup,
+            "fetch_source_data",
+            lambda *args, **kwargs: [
+                {
+                    "code": lang_code,
+                    "contents": [{"code": resource_type, "name": "Benchmark"}],
+                }
+                for lang_code in LANGUAGE_NAMES
+            ],
+        )
+        monkeypatch.setattr(
+            resource_lookup,
+            "book_codes_for_lang",
+            lambda *args, **kwargs: [
+                (book_code, book_name) for book_code, book_name, _, _ in NT_BOOKS
+            ],
+        )
+        monkeypatch.setattr(
+            resource_lookup, "usfm_resource_lookup", usfm_resource_lookup
+        )
+        monkeypatch.setattr(
+            resource_lookup,
+            "provision_asset_files",
+            lambda resource_lookup_dto, *args, **kwargs: resource_lookup_dto.url,
+        )
+        yield
+
+
+@pytest.fixture
+def cold() -> Callable[..., None]:
+    """
+    Return a function that removes the documents of the given
+    document request keys and empties the book and backtranslation
+    caches so that the next request for them starts from scratch.
+    """
+    from document.domain import document_generator
+
+    from dft.domain import backtranslation_cache, book_cache, row_manifest
+
+    def cold(*document_request_keys: str) -> None:
+        for document_request_key in document_request_keys:
+            html_filepath = document_generator.html_filepath(document_request_key)
+            for filepath in (
+                html_filepath,
+                row_manifest.manifest_filepath(html_filepath),
+                document_generator.pdf_filepath(document_request_key),
+                document_generator.docx_filepath(document_request_key),
+            ):
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+        book_cache.book_cache.cache_clear()
+        backtranslation_cache.backtranslation_cache.cache_clear()
+
+    return cold
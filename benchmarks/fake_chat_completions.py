@@ -0,0 +1,144 @@
+"""
+This module provides a local stand-in for OpenAI's chat completions
+endpoint with configurable latency and rate limiting. It answers both
+the single verse prompts and the batched, JSON object, prompts of
+dft.domain.backtranslation with made up backtranslations.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Mapping, Optional
+
+
+class FakeChatCompletions:
+    """
+    Serve chat completions on a local port, each taking latency seconds
+    plus latency_per_verse seconds for each verse it backtranslates.
+    Every rate_limit_every-th request, if set, is refused with a 429
+    and a Retry-After of retry_after seconds, as OpenAI does when
+    requests or tokens per minute are exceeded.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        latency_per_verse: float = 0.0,
+        rate_limit_every: int = 0,
+        retry_after: float = 0.0,
+    ) -> None:
+        self.latency = latency
+        self.latency_per_verse = latency_per_verse
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self.reset()
+
+    def reset(self) -> None:
+        """Zero the request counters."""
+        with self._lock:
+            self.requests = 0
+            self.rate_limited = 0
+            self.verses = 0
+
+    def rate_limit(self) -> bool:
+        """Count a request and return whether to refuse it."""
+        with self._lock:
+            self.requests += 1
+            if self.rate_limit_every and self.requests % self.rate_limit_every == 0:
+                self.rate_limited += 1
+                return True
+            return False
+
+    def content(self, body: Mapping[str, Any]) -> tuple[str, int]:
+        """
+        Return the content answering body's prompt and the number of
+        verses it backtranslates.
+        """
+        prompt = body["messages"][-1]["content"]
+        if body.get("response_format", {}).get("type") == "json_object":
+            # The verses, keyed by reference, follow the instructions.
+            verses = json.loads(prompt.rsplit("\n\n", 1)[1])
+            return (
+                json.dumps(
+                    {
+                        verse_reference: f"Backtranslation of {verse_text}"
+                        for verse_reference, verse_text in verses.items()
+                    }
+                ),
+                len(verses),
+            )
+        return f"Backtranslation of {prompt}", 1
+
+    def completion(self, body: Mapping[str, Any]) -> dict[str, Any]:
+        content, verses = self.content(body)
+        with self._lock:
+            self.verses += verses
+        time.sleep(self.latency + self.latency_per_verse * verses)
+        return {
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": len(body["messages"][-1]["content"]) // 4,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": (len(body["messages"][-1]["content"]) + len(content))
+                // 4,
+            },
+        }
+
+    @property
+    def url(self) -> str:
+        """The base URL to configure the OpenAI client with."""
+        assert self._server is not None
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeChatCompletions":
+        chat_completions = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                if chat_completions.rate_limit():
+                    response: dict[str, Any] = {
+                        "error": {
+                            "message": "Rate limit reached",
+                            "type": "requests",
+                            "code": "rate_limit_exceeded",
+                        }
+                    }
+                    status = 429
+                else:
+                    response = chat_completions.completion(body)
+                    status = 200
+                content = json.dumps(response).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                if status == 429:
+                    self.send_header("Retry-After", str(chat_completions.retry_after))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,140 @@
+"""
+This module provides a local stand-in for the data API's GraphQL
+endpoint that answers the language and gateway language queries of
+dft.domain.data_api, including the schema introspection the gql
+client does on connecting.
+"""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Mapping, Optional
+
+from graphql import build_schema, graphql_sync
+
+SCHEMA = build_schema(
+    """
+input StringComparison { _eq: String }
+input BooleanComparison { _eq: Boolean }
+input LanguageWhere { ietf_code: StringComparison }
+input ContentMetaWhere { status: StringComparison, show_on_biel: BooleanComparison }
+input ContentWhere { wa_content_meta: ContentMetaWhere }
+
+type Language {
+  ietf_code: String
+  english_name: String
+  national_name: String
+  languagesToLanguagesByGatewayLanguageToIetf: [GatewayLanguage]
+}
+
+type GatewayLanguage {
+  gateway_language_ietf: String
+  language: Language
+}
+
+type Content { language: Language }
+
+type Query {
+  language(where: LanguageWhere): [Language]
+  content(where: ContentWhere): [Content]
+}
+"""
+)
+
+
+class FakeDataApi:
+    """
+    Serve, on a local port, languages, keyed by code, named as in
+    language_names and associated with the gateway languages in
+    gateway_languages, taking latency seconds to answer each query.
+    """
+
+    def __init__(
+        self,
+        language_names: Mapping[str, str],
+        gateway_languages: Mapping[str, str],
+        latency: float = 0.0,
+    ) -> None:
+        self.language_names = language_names
+        self.gateway_languages = gateway_languages
+        self.latency = latency
+        self.requests = 0
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def language(self, lang_code: str) -> dict[str, Any]:
+        gl_lang_code = self.gateway_languages.get(lang_code)
+        return {
+            "ietf_code": lang_code,
+            "english_name": self.language_names.get(lang_code, lang_code),
+            "national_name": self.language_names.get(lang_code, lang_code),
+            "languagesToLanguagesByGatewayLanguageToIetf": (
+                [
+                    {
+                        "gateway_language_ietf": gl_lang_code,
+                        "language": {
+                            "english_name": self.language_names.get(
+                                gl_lang_code, gl_lang_code
+                            )
+                        },
+                    }
+                ]
+                if gl_lang_code
+                else []
+            ),
+        }
+
+    def root_value(self) -> dict[str, Any]:
+        return {
+            "language": lambda info, where: [self.language(where["ietf_code"]["_eq"])],
+            "content": lambda info, where: [
+                {"language": self.language(lang_code)}
+                for lang_code in self.language_names
+            ],
+        }
+
+    def execute(self, body: Mapping[str, Any]) -> dict[str, Any]:
+        self.requests += 1
+        time.sleep(self.latency)
+        result = graphql_sync(
+            SCHEMA,
+            body["query"],
+            root_value=self.root_value(),
+            variable_values=body.get("variables"),
+            operation_name=body.get("operationName"),
+        )
+        response: dict[str, Any] = {"data": result.data}
+        if result.errors:
+            response["errors"] = [error.formatted for error in result.errors]
+        return response
+
+    @property
+    def url(self) -> str:
+        assert self._server is not None
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1/graphql"
+
+    def start(self) -> "FakeDataApi":
+        data_api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                content = json.dumps(data_api.execute(body)).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
@@ -0,0 +1,99 @@
+"""
+Benchmarks of starting each of dft's process types, the API and the
+worker, in a fresh interpreter: the time to import what the process
+imports on startup and the memory, as maximum resident set size, it
+then has. The API shouldn't import the worker's heavy dependencies,
+neither on startup nor when it answers a document request.
+"""
+
+import json
+import os
+import subprocess
+import sys
+from statistics import median
+from typing import Any
+
+import pytest
+
+# What each process type imports on startup: the API its FastAPI app,
+# the worker its celery app and the modules that define its tasks.
+STARTUP_IMPORTS = {
+    "api": "import dft.entrypoints.app",
+    "worker": "from dft.domain.worker import app; app.loader.import_default_modules()",
+}
+
+# What the API does to answer a document request before, if need be,
+# enqueueing it.
+API_REQUEST = """
+from dft.domain import documents
+from dft.domain.model import DocumentRequest
+documents.fresh_terms_documents(DocumentRequest(lang_code="en", terms="all"))
+documents.terms_document("en_god_the_father_terms", True, True)
+"""
+
+MEASURE = """
+import json, resource, sys, time
+start = time.perf_counter()
+{imports}
+seconds = time.perf_counter() - start
+{after}
+print(json.dumps({{
+    "seconds": seconds,
+    "max_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "modules": sorted(sys.modules),
+}}))
+"""
+
+# Modules only the worker needs.
+WORKER_ONLY_MODULES = [
+    "bs4",
+    "dft.domain.dft_checker",
+    "docx",
+    "docxcompose",
+    "document.domain.document_generator",
+    "lxml",
+    "openai",
+]
+
+
+def start(process_type: str, after: str = "") -> dict[str, Any]:
+    """
+    Import what process_type imports on startup in a fresh interpreter,
+    then run after, and return the import time, maximum RSS and modules
+    imported.
+    """
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            MEASURE.format(imports=STARTUP_IMPORTS[process_type], after=after),
+        ],
+        env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)},
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    result: dict[str, Any] = json.loads(completed.stdout.splitlines()[-1])
+    return result
+
+
+@pytest.mark.parametrize("after", ["", API_REQUEST], ids=["startup", "request"])
+def test_api_does_not_import_worker_modules(after: str) -> None:
+    modules = set(start("api", after)["modules"])
+    assert [module for module in WORKER_ONLY_MODULES if module in modules] == []
+
+
+@pytest.mark.benchmark(group="startup")
+@pytest.mark.parametrize("process_type", sorted(STARTUP_IMPORTS))
+def test_startup(benchmark: Any, process_type: str) -> None:
+    starts: list[dict[str, Any]] = []
+    benchmark.pedantic(
+        lambda: starts.append(start(process_type)), rounds=5, iterations=1
+    )
+    benchmark.extra_info["import_seconds"] = median(
+        start_["seconds"] for start_ in starts
+    )
+    benchmark.extra_info["max_rss_kib"] = median(
+        start_["max_rss_kib"] for start_ in starts
+    )
+    benchmark.extra_info["modules"] = len(starts[-1]["modules"])
@@ -0,0 +1,246 @@
+"""
+Benchmarks of producing the God the Father and Son of God terms
+tables, stage by stage and end to end, against the local stand-ins set
+up in conftest. Each stage is its own benchmark group so that a
+regression can be pinned on a stage when comparing runs, e.g.:
+
+    pytest --benchmark-autosave
+    pytest-benchmark compare
+"""
+
+import os
+from typing import Any, Callable
+
+import pytest
+from conftest import GL_LANG_CODE, HL_LANG_CODE
+from fake_chat_completions import FakeChatCompletions
+from fake_data_api import FakeDataApi
+
+from dft.domain import dft_checker
+from dft.domain.backtranslation import backtranslations_as_completed
+from dft.domain.model import DocumentRequestTermsEnum, TermsBook, TermsTable
+from dft.domain.table_writer import TableWriter
+from document.domain import document_generator
+from toolz import unique  # type: ignore
+
+# Rounds of the benchmarks whose every round starts cold, i.e., that
+# provision, parse and backtranslate everything again.
+COLD_ROUNDS = 3
+
+TERMS_FOR_LANGUAGE: dict[DocumentRequestTermsEnum, Callable[..., str]] = {
+    DocumentRequestTermsEnum.GTF: dft_checker.gtf_terms_for_language,
+    DocumentRequestTermsEnum.SOG: dft_checker.sog_terms_for_language,
+}
+
+
+@pytest.fixture(params=list(TERMS_FOR_LANGUAGE), ids=lambda terms: terms.value)
+def terms(request: pytest.FixtureRequest) -> DocumentRequestTermsEnum:
+    return request.param  # type: ignore[no-any-return]
+
+
+@pytest.fixture
+def terms_table(terms: DocumentRequestTermsEnum) -> TermsTable:
+    return dft_checker.TERMS_TABLES[terms]
+
+
+@pytest.fixture
+def document_request_key(terms_table: TermsTable) -> str:
+    return dft_checker.document_request_key(HL_LANG_CODE, terms_table.table_name)
+
+
+@pytest.fixture(scope="session")
+def books() -> tuple[list[TermsBook], list[TermsBook]]:
+    """The HL books, for every terms table, and the GL books."""
+    return (
+        dft_checker.hl_usfm_books(HL_LANG_CODE, dft_checker.ALL_TERMS_TABLES),
+        dft_checker.gl_usfm_books(GL_LANG_CODE, dft_checker.ALL_TERMS_TABLES),
+    )
+
+
+@pytest.fixture
+def rows(
+    books: tuple[list[TermsBook], list[TermsBook]], terms_table: TermsTable
+) -> list[tuple[str, str, str]]:
+    return dft_checker.term_verses(
+        books[0], books[1], terms_table.terms, dft_checker.BOOK_NAMES
+    )
+
+
+def chat_completions_info(chat_completions: FakeChatCompletions) -> dict[str, Any]:
+    return {
+        "chat_completions": chat_completions.requests,
+        "rate_limited": chat_completions.rate_limited,
+        "verses": chat_completions.verses,
+    }
+
+
+@pytest.mark.benchmark(group="gateway_language")
+def test_gateway_language(benchmark: Any, data_api: FakeDataApi) -> None:
+    gl_lang_code = benchmark(
+        dft_checker.associated_gateway_language_for_heart_language, HL_LANG_CODE
+    )
+    assert gl_lang_code == GL_LANG_CODE
+
+
+@pytest.mark.benchmark(group="load_books")
+def test_load_hl_books(
+    benchmark: Any, cold: Callable[..., None], terms_table: TermsTable
+) -> None:
+    hl_usfm_books = benchmark.pedantic(
+        dft_checker.hl_usfm_books,
+        args=(HL_LANG_CODE, [terms_table.terms]),
+        setup=cold,
+        rounds=COLD_ROUNDS,
+    )
+    assert len(hl_usfm_books) == len(terms_table.terms)
+
+
+@pytest.mark.benchmark(group="load_books")
+def test_load_gl_books(benchmark: Any, cold: Callable[..., None]) -> None:
+    gl_usfm_books = benchmark.pedantic(
+        dft_checker.gl_usfm_books,
+        args=(GL_LANG_CODE, dft_checker.ALL_TERMS_TABLES),
+        setup=cold,
+        rounds=COLD_ROUNDS,
+    )
+    assert gl_usfm_books
+
+
+@pytest.mark.benchmark(group="load_books_cached")
+def test_load_hl_books_cached(benchmark: Any, terms_table: TermsTable) -> None:
+    dft_checker.hl_usfm_books(HL_LANG_CODE, [terms_table.terms])
+    assert benchmark(dft_checker.hl_usfm_books, HL_LANG_CODE, [terms_table.terms])
+
+
+@pytest.mark.benchmark(group="term_verses")
+def test_term_verses(
+    benchmark: Any,
+    books: tuple[list[TermsBook], list[TermsBook]],
+    terms_table: TermsTable,
+) -> None:
+    rows = benchmark(
+        dft_checker.term_verses,
+        books[0],
+        books[1],
+        terms_table.terms,
+        dft_checker.BOOK_NAMES,
+    )
+    assert rows
+
+
+@pytest.mark.benchmark(group="backtranslate")
+def test_backtranslate(
+    benchmark: Any,
+    cold: Callable[..., None],
+    chat_completions: FakeChatCompletions,
+    rows: list[tuple[str, str, str]],
+) -> None:
+    verses = list(
+        unique((verse_reference, hl_verse) for verse_reference, _, hl_verse in rows)
+    )
+
+    def setup() -> None:
+        cold()
+        chat_completions.reset()
+
+    backtranslations = benchmark.pedantic(
+        lambda: dict(backtranslations_as_completed(verses, HL_LANG_CODE, GL_LANG_CODE)),
+        setup=setup,
+        rounds=COLD_ROUNDS,
+    )
+    benchmark.extra_info.update(chat_completions_info(chat_completions))
+    assert len(backtranslations) == len(verses)
+
+
+@pytest.mark.benchmark(group="write_html")
+def test_write_html(
+    benchmark: Any, tmp_path: Any, rows: list[tuple[str, str, str]]
+) -> None:
+    backtranslations = {
+        (verse_reference, hl_verse): f"Backtranslation of {verse_reference}"
+        for verse_reference, _, hl_verse in rows
+    }
+    header = document_generator.instantiated_html_header_template(
+        "header_enclosing_landscape"
+    )
+
+    def write_html() -> None:
+        with TableWriter(
+            str(tmp_path / "table.html"), rows, header, dft_checker.COLUMN_LABELS
+        ) as writer:
+            writer.write_ready(backtranslations)
+
+    benchmark(write_html)
+
+
+@pytest.mark.benchmark(group="convert")
+@pytest.mark.parametrize("docx_p", [False, True], ids=["pdf", "docx"])
+def test_convert(
+    benchmark: Any,
+    cold: Callable[..., None],
+    terms: DocumentRequestTermsEnum,
+    terms_table: TermsTable,
+    document_request_key: str,
+    docx_p: bool,
+) -> None:
+    cold(document_request_key)
+    TERMS_FOR_LANGUAGE[terms](HL_LANG_CODE, docx_p, document_request_key)
+    filepath = (
+        document_generator.docx_filepath(document_request_key)
+        if docx_p
+        else document_generator.pdf_filepath(document_request_key)
+    )
+    convert: Callable[[], None] = (
+        (
+            lambda: dft_checker.docx_document(
+                HL_LANG_CODE, document_request_key, terms_table.title
+            )
+        )
+        if docx_p
+        else (lambda: dft_checker.pdf_document(document_request_key))
+    )
+
+    def setup() -> None:
+        # Force the conversion to run.
+        os.remove(filepath)
+
+    benchmark.pedantic(convert, setup=setup, rounds=COLD_ROUNDS)
+
+
+@pytest.mark.benchmark(group="end_to_end")
+def test_end_to_end(
+    benchmark: Any,
+    cold: Callable[..., None],
+    chat_completions: FakeChatCompletions,
+    terms: DocumentRequestTermsEnum,
+    document_request_key: str,
+) -> None:
+    def setup() -> None:
+        cold(document_request_key)
+        chat_completions.reset()
+
+    assert (
+        benchmark.pedantic(
+            TERMS_FOR_LANGUAGE[terms],
+            args=(HL_LANG_CODE, False, document_request_key),
+            setup=setup,
+            rounds=COLD_ROUNDS,
+        )
+        == document_request_key
+    )
+    benchmark.extra_info.update(chat_completions_info(chat_completions))
+
+
+@pytest.mark.benchmark(group="end_to_end_fresh")
+def test_end_to_end_fresh(
+    benchmark: Any,
+    cold: Callable[..., None],
+    terms: DocumentRequestTermsEnum,
+    document_request_key: str,
+) -> None:
+    cold(document_request_key)
+    TERMS_FOR_LANGUAGE[terms](HL_LANG_CODE, False, document_request_key)
+    assert (
+        benchmark(TERMS_FOR_LANGUAGE[terms], HL_LANG_CODE, False, document_request_key)
+        == document_request_key
+    )
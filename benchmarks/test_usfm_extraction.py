@@ -0,0 +1,136 @@
+"""
+Checks that targeted USFM extraction, dft.domain.usfm_extraction,
+yields the same verses as DOC's full parse, which it replaces when
+USE_TARGETED_USFM_EXTRACTION is on, both on the synthetic NT and on
+USFM with the markup real translations use: alignment milestones,
+word attributes, figures, alternate verse numbers, notes and verse
+bridges.
+"""
+
+import re
+from pathlib import Path
+
+import pytest
+from conftest import HL_LANG_CODE
+
+from dft.domain import usfm_extraction
+from dft.domain.god_the_father_terms import gtf_terms_table
+from dft.domain.model import TermsBook
+from dft.domain.son_of_god_terms import sog_terms_table
+from dft.domain.verse_text import verse_text
+from document.config import settings
+from document.domain import resource_lookup
+
+# Matthew 1:1-6 marked up as in the ULT and other aligned translations.
+ALIGNED_USFM = r"""\id MAT EN_ULT en_English_ltr
+\usfm 3.0
+\h Matthew
+\mt Matthew
+\s5
+\c 1
+\p
+\v 1 \zaln-s |x-strong="G09760" x-lemma="βίβλος" x-occurrence="1" x-occurrences="1" x-content="βίβλος"\*\w The|x-occurrence="1" x-occurrences="1"\w*
+\w book|x-occurrence="1" x-occurrences="1"\w*\zaln-e\*
+\zaln-s |x-strong="G10780" x-lemma="γένεσις" x-occurrence="1" x-occurrences="1" x-content="γενέσεως"\*\w of|x-occurrence="1" x-occurrences="2"\w*
+\w the|x-occurrence="1" x-occurrences="2"\w*
+\w genealogy|x-occurrence="1" x-occurrences="1"\w*\zaln-e\*
+\w of|x-occurrence="2" x-occurrences="2"\w* \w Jesus|x-occurrence="1" x-occurrences="1"\w* \w Christ|x-occurrence="1" x-occurrences="1"\w*,
+\w son|x-occurrence="1" x-occurrences="2"\w* of David.\f + \fr 1:1 \ft Or \fq son \ft means descendant.\f*
+\v 2 \va 2a\va* Abraham was the father of Isaac,\x - \xo 1:2 \xt Gen 21:3\x* and Isaac the father of Jacob.
+\q1 Jacob was the father of Judah
+\q2 and his brothers.
+\s5
+\v 3 \vp 3\vp* Judah was the father of Perez \fig Perez and Zerah|src="pz.jpg" size="col" ref="1:3"\fig*and Zerah by Tamar.
+\v 4-5 Perez was the father of Hezron, \+w Hezron|strong="H2696"\+w* of Ram, \rq Ruth 4:18\rq* and Ram of Amminadab.
+\p
+\v 6 Jesse was the father of David the \bd king\bd*.
+"""
+
+
+@pytest.fixture(scope="session")
+def resource_type() -> str:
+    return next(
+        resource_type
+        for resource_type in settings.USFM_RESOURCE_TYPES
+        if resource_type in settings.ALL_USFM_RESOURCE_TYPES
+    )
+
+
+def verses(terms_book: TermsBook) -> dict[int, dict[str, str]]:
+    """Return the text of each verse of terms_book, whitespace collapsed."""
+    return {
+        chapter_num: {
+            verse_num: re.sub(r"\s+", " ", verse_text(verse)).strip()
+            for verse_num, verse in chapter.verses.items()
+        }
+        for chapter_num, chapter in terms_book.chapters.items()
+    }
+
+
+def assert_extraction_matches_parse(
+    resource_dir: Path,
+    resource_type: str,
+    book_code: str,
+    chapters: dict[int, set[int]],
+) -> None:
+    resource_lookup_dto = resource_lookup.usfm_resource_lookup(
+        HL_LANG_CODE, resource_type, book_code
+    )
+    extracted, parsed = (
+        usfm_extraction.usfm_terms_book(
+            resource_lookup_dto,
+            str(resource_dir),
+            HL_LANG_CODE,
+            resource_type,
+            book_code,
+            chapters,
+            use_targeted_usfm_extraction,
+        )
+        for use_targeted_usfm_extraction in (True, False)
+    )
+    assert verses(extracted) == verses(parsed)
+
+
+@pytest.mark.parametrize(
+    "book_code",
+    sorted(set(gtf_terms_table) | set(sog_terms_table)),
+)
+def test_synthetic_nt(
+    pytestconfig: pytest.Config, resource_type: str, book_code: str
+) -> None:
+    assert_extraction_matches_parse(
+        pytestconfig.dft_working_dir / "resources" / HL_LANG_CODE,  # type: ignore[attr-defined]
+        resource_type,
+        book_code,
+        usfm_extraction.needed_chapters([gtf_terms_table, sog_terms_table], book_code),
+    )
+
+
+def test_aligned_usfm(tmp_path: Path, resource_type: str) -> None:
+    (tmp_path / "41-MAT.usfm").write_text(ALIGNED_USFM, encoding="utf-8")
+    assert_extraction_matches_parse(
+        tmp_path, resource_type, "mat", {1: {1, 2, 3, 4, 5, 6}}
+    )
+
+
+def test_aligned_usfm_text() -> None:
+    extracted = usfm_extraction.extract_verses(ALIGNED_USFM, {1: {1, 2, 3, 5}})
+    assert extracted == {
+        1: {
+            "1": (
+                "1",
+                "The book of the genealogy of Jesus Christ, son of David.",
+            ),
+            "2": (
+                "2",
+                "Abraham was the father of Isaac, and Isaac the father of"
+                " Jacob. Jacob was the father of Judah and his brothers.",
+            ),
+            "3": ("3", "Judah was the father of Perez and Zerah by Tamar."),
+            "5": (
+                "4-5",
+                "Perez was the father of Hezron, Hezron of Ram, and Ram of"
+                " Amminadab.",
+            ),
+        }
+    }
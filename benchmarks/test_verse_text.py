@@ -0,0 +1,56 @@
+"""
+Benchmarks of extracting the text of verses' HTML for prompts, by
+dft.domain.verse_text and by BeautifulSoup which it replaces, along
+with a check that the two agree on every verse of the synthetic NTs
+and on verses with markup beyond the usual.
+"""
+
+from typing import Any
+
+import pytest
+from conftest import GL_LANG_CODE, HL_LANG_CODE
+
+from dft.domain import dft_checker
+from dft.domain.verse_text import soup_text, verse_texts
+
+# Verses with markup and character references that the synthetic NTs
+# don't have.
+UNUSUAL_VERSES = [
+    "<span class=\"v-num\" id='ach-SS-acholi-040-ch-005-v-016'><sup><b>16</b></sup></span> Wun bene wubed jo ma menyo piny calo tara bot dano. ",
+    "<span class=\"v-num\" id='en-040-ch-001-v-001'><sup><b>1</b></sup></span> Bread &amp; wine&nbsp;&#8212; &lt;fish&gt; &quot;loaves&quot;",
+    '  <span class="v-num"><sup><b>2</b></sup></span>\n<i>Selah</i> <b>x</b>',
+    '<span class="v-num"><sup><b>3</b></sup></span> <p>a</p><div>b</div>',
+    '<span class="v-num"><sup><b>4</b></sup></span> a &copy b &#128; c &#0; <!-- d -->',
+    "</span>stray<br/>end",
+    "",
+]
+
+
+@pytest.fixture(scope="session")
+def corpus() -> list[str]:
+    """The HTML of every HL and GL verse of the synthetic NTs."""
+    books = dft_checker.hl_usfm_books(
+        HL_LANG_CODE, dft_checker.ALL_TERMS_TABLES
+    ) + dft_checker.gl_usfm_books(GL_LANG_CODE, dft_checker.ALL_TERMS_TABLES)
+    return [
+        verse
+        for book in books
+        for chapter in book.chapters.values()
+        for verse in chapter.verses.values()
+    ] + UNUSUAL_VERSES
+
+
+def test_verse_texts_match_beautifulsoup(corpus: list[str]) -> None:
+    assert verse_texts(corpus) == [soup_text(verse) for verse in corpus]
+
+
+@pytest.mark.benchmark(group="verse_text")
+def test_verse_texts(benchmark: Any, corpus: list[str]) -> None:
+    benchmark.extra_info["verses"] = len(corpus)
+    assert len(benchmark(verse_texts, corpus)) == len(corpus)
+
+
+@pytest.mark.benchmark(group="verse_text")
+def test_soup_texts(benchmark: Any, corpus: list[str]) -> None:
+    benchmark.extra_info["verses"] = len(corpus)
+    assert len(benchmark(lambda: [soup_text(verse) for verse in corpus])) == len(corpus)
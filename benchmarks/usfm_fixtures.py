@@ -0,0 +1,118 @@
+"""
+This module provides synthetic USFM New Testaments sized like real
+translations, i.e., every NT book with its real number of chapters and
+about as many verses per chapter, for the benchmarks to provision
+books from instead of the network.
+"""
+
+import random
+from pathlib import Path
+from typing import Iterable, Mapping
+
+# (book code, book name, book number as used in USFM file names,
+# number of chapters)
+NT_BOOKS: list[tuple[str, str, int, int]] = [
+    ("mat", "Matthew", 41, 28),
+    ("mrk", "Mark", 42, 16),
+    ("luk", "Luke", 43, 24),
+    ("jhn", "John", 44, 21),
+    ("act", "Acts", 45, 28),
+    ("rom", "Romans", 46, 16),
+    ("1co", "1 Corinthians", 47, 16),
+    ("2co", "2 Corinthians", 48, 13),
+    ("gal", "Galatians", 49, 6),
+    ("eph", "Ephesians", 50, 6),
+    ("php", "Philippians", 51, 4),
+    ("col", "Colossians", 52, 4),
+    ("1th", "1 Thessalonians", 53, 5),
+    ("2th", "2 Thessalonians", 54, 3),
+    ("1ti", "1 Timothy", 55, 6),
+    ("2ti", "2 Timothy", 56, 4),
+    ("tit", "Titus", 57, 3),
+    ("phm", "Philemon", 58, 1),
+    ("heb", "Hebrews", 59, 13),
+    ("jas", "James", 60, 5),
+    ("1pe", "1 Peter", 61, 5),
+    ("2pe", "2 Peter", 62, 3),
+    ("1jn", "1 John", 63, 5),
+    ("2jn", "2 John", 64, 1),
+    ("3jn", "3 John", 65, 1),
+    ("jud", "Jude", 66, 1),
+    ("rev", "Revelation", 67, 22),
+]
+
+# The NT averages about 31 verses per chapter.
+VERSES_PER_CHAPTER = 31
+WORDS_PER_VERSE = 24
+
+
+def words(rng: random.Random, count: int) -> list[str]:
+    """Return count made up words."""
+    syllables = ["ka", "ma", "ni", "to", "ru", "se", "lo", "wa", "pe", "di", "yu"]
+    return [
+        "".join(rng.choice(syllables) for _ in range(rng.randint(1, 4)))
+        for _ in range(count)
+    ]
+
+
+def book_usfm(
+    rng: random.Random,
+    book_code: str,
+    book_name: str,
+    chapters: int,
+    min_verses: Mapping[int, int],
+) -> str:
+    """
+    Return the USFM of a book of chapters chapters, each with at least
+    min_verses of its verses, containing the markers translations
+    commonly use: headings, paragraphs, poetry, chunk markers and
+    footnotes.
+    """
+    lines = [
+        f"\\id {book_code.upper()} synthetic",
+        f"\\h {book_name}",
+        "\\mt1 " + book_name,
+    ]
+    for chapter_num in range(1, chapters + 1):
+        lines += [f"\\c {chapter_num}", "\\p"]
+        verses = max(
+            VERSES_PER_CHAPTER + rng.randint(-8, 8), min_verses.get(chapter_num, 0)
+        )
+        for verse_num in range(1, verses + 1):
+            if verse_num % 5 == 1:
+                lines.append("\\s5")
+            text = " ".join(
+                words(rng, rng.randint(WORDS_PER_VERSE // 2, WORDS_PER_VERSE * 3 // 2))
+            )
+            if rng.random() < 0.05:
+                text += f" \\f + \\ft {' '.join(words(rng, 6))}\\f*"
+            lines.append(f"\\v {verse_num} {text}.")
+            if rng.random() < 0.1:
+                lines.append(f"\\q1 {' '.join(words(rng, 8))}")
+    return "\n".join(lines) + "\n"
+
+
+def write_new_testament(
+    resource_dir: Path,
+    lang_code: str,
+    terms_tables: Iterable[Mapping[str, Mapping[int, list[int]]]],
+) -> None:
+    """
+    Write a synthetic NT for lang_code to resource_dir, one file per
+    book named as in translation repos, e.g., 41-MAT.usfm, that has
+    every verse terms_tables look up. The content depends only on
+    lang_code so that results are comparable from run to run.
+    """
+    terms_tables = list(terms_tables)
+    resource_dir.mkdir(parents=True, exist_ok=True)
+    for book_code, book_name, book_num, chapters in NT_BOOKS:
+        min_verses: dict[int, int] = {}
+        for terms in terms_tables:
+            for chapter_num, verse_nums in terms.get(book_code, {}).items():
+                min_verses[chapter_num] = max(
+                    min_verses.get(chapter_num, 0), *verse_nums
+                )
+        rng = random.Random(f"{lang_code}-{book_code}")
+        (resource_dir / f"{book_num}-{book_code.upper()}.usfm").write_text(
+            book_usfm(rng, book_code, book_name, chapters, min_verses), encoding="utf-8"
+        )
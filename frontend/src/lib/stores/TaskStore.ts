@@ -3,3 +3,12 @@ import type { Writable } from 'svelte/store';
 
 export let taskIdStore: Writable<string> = writable<string>('');
 export let taskStateStore: Writable<string> = writable<string>('');
+// Structured progress of the task, if it has reported any, see
+// TaskProgress in backend/dft/domain/model.py
+export let taskProgressStore: Writable<{
+  phase: string;
+  label: string;
+  completed: number;
+  total: number | null;
+  eta: number | null;
+} | null> = writable(null);